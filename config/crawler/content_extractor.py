@@ -1,7 +1,68 @@
-from bs4 import BeautifulSoup
+import codecs
+from functools import lru_cache
+import charset_normalizer
+import lxml.html
+from lxml import etree
 import re
 from urllib.parse import urlparse
 
+_WORD_RE = re.compile(r'\b\w+\b')
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+# Compiled once; each runs as a single C traversal of the tree
+_TITLE_XP = etree.XPath('(//title)[1]')
+_H1_XP = etree.XPath('(//h1)[1]')
+_META_DESCRIPTION_XP = etree.XPath('string((//meta[@name="description"])[1]/@content)')
+_HEADINGS_XP = etree.XPath('//h1|//h2|//h3|//h4|//h5|//h6')
+_MAIN_CONTENT_XP = etree.XPath('(//main)[1]|(//article)[1]|(//body)[1]')
+_LINKS_XP = etree.XPath('//a[@href]')
+_IMAGES_XP = etree.XPath('//img[@src]')
+
+@lru_cache(maxsize=None)
+def _html_parser(encoding):
+    return lxml.html.HTMLParser(encoding=encoding)
+
+def _codec_name(encoding):
+    """Normalize a declared charset (e.g. '"UTF-8";') to a codec name, None if unknown"""
+    encoding = encoding.strip().strip('"\';,').strip()
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+def _document_fromstring(html_content, encoding):
+    try:
+        return lxml.html.document_fromstring(html_content, parser=_html_parser(encoding))
+    except etree.ParserError:
+        # Empty documents have no root; treat them as an empty page
+        return lxml.html.Element('html')
+
+def parse_html(html_content, encoding=None):
+    """Parse HTML (str or bytes) into an lxml document tree
+    
+    encoding is typically the Content-Type charset; it only applies to
+    bytes and is ignored if it names no known codec. For bytes without a usable encoding, libxml2
+    honours a declared <meta charset>; otherwise charset-normalizer
+    detects it.
+    """
+    if isinstance(html_content, str):
+        # lxml rejects str input with an XML encoding declaration (common
+        # on XHTML pages); the text is already decoded, so parse it as UTF-8
+        return _document_fromstring(html_content.encode('utf-8', 'replace'), 'utf-8')
+        
+    if encoding is not None:
+        encoding = _codec_name(encoding)
+    if encoding is None and not _META_CHARSET_RE.search(html_content, 0, 2048):
+        match = charset_normalizer.from_bytes(html_content).best()
+        # Python codec names (e.g. utf_8) are not all known to libxml2
+        encoding = codecs.lookup(match.encoding).name if match else None
+    try:
+        return _document_fromstring(html_content, encoding)
+    except LookupError:
+        # Some codecs Python knows (e.g. mac-roman) are unknown to libxml2;
+        # let it work out the encoding itself
+        return _document_fromstring(html_content, None)
+
 class ContentExtractor:
     def __init__(self):
         self.text_tags = ['p', 'div', 'span', 'article', 'section']
@@ -9,84 +70,86 @@ class ContentExtractor:
         
     def extract(self, html_content, url):
         """Extract structured content from HTML"""
-        soup = BeautifulSoup(html_content, 'html.parser')
+        return self.extract_from_tree(parse_html(html_content), url)
+        
+    def extract_from_tree(self, tree, url):
+        """Extract structured content from an already parsed page.
         
+        Non-content elements are removed in place, so callers sharing
+        the tree should read anything else they need from it first.
+        """
         # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer"]):
-            script.decompose()
-            
+        etree.strip_elements(tree, 'script', 'style', 'nav', 'footer', with_tail=False)
+        
         return {
-            'title': self.extract_title(soup),
-            'meta_description': self.extract_meta_description(soup),
-            'headings': self.extract_headings(soup),
-            'body_text': self.extract_body_text(soup),
-            'links_text': self.extract_links_text(soup),
-            'images': self.extract_images(soup, url),
-            'word_count': self.count_words(soup.get_text()),
-            'language': self.detect_language(soup)
+            'title': self.extract_title(tree),
+            'meta_description': self.extract_meta_description(tree),
+            'headings': self.extract_headings(tree),
+            'body_text': self.extract_body_text(tree),
+            'links_text': self.extract_links_text(tree),
+            'images': self.extract_images(tree, url),
+            'word_count': self.count_words(tree.text_content()),
+            'language': self.detect_language(tree)
         }
         
-    def extract_title(self, soup):
+    def extract_title(self, tree):
         """Extract page title"""
-        title_tag = soup.find('title')
-        if title_tag:
-            return title_tag.get_text().strip()
+        title_tags = _TITLE_XP(tree)
+        if title_tags:
+            return title_tags[0].text_content().strip()
             
         # Fallback to h1
-        h1_tag = soup.find('h1')
-        if h1_tag:
-            return h1_tag.get_text().strip()
+        h1_tags = _H1_XP(tree)
+        if h1_tags:
+            return h1_tags[0].text_content().strip()
             
         return ""
         
-    def extract_meta_description(self, soup):
+    def extract_meta_description(self, tree):
         """Extract meta description"""
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            return meta_desc['content'].strip()
-        return ""
+        return _META_DESCRIPTION_XP(tree).strip()
         
-    def extract_headings(self, soup):
+    def extract_headings(self, tree):
         """Extract all headings with hierarchy"""
-        headings = []
-        for tag in self.heading_tags:
-            for heading in soup.find_all(tag):
-                headings.append({
-                    'level': int(tag[1]),
-                    'text': heading.get_text().strip()
-                })
+        headings = [{
+            'level': int(heading.tag[1]),
+            'text': heading.text_content().strip()
+        } for heading in _HEADINGS_XP(tree)]
+        
+        # Group by level, keeping document order within a level
+        headings.sort(key=lambda heading: heading['level'])
         return headings
         
-    def extract_body_text(self, soup):
+    def extract_body_text(self, tree):
         """Extract main body text"""
         # Remove non-content elements
-        for element in soup(['nav', 'footer', 'sidebar', 'aside']):
-            element.decompose()
-            
-        # Get text from main content areas
-        main_content = soup.find('main') or soup.find('article') or soup.find('body')
-        if main_content:
-            text = main_content.get_text()
+        etree.strip_elements(tree, 'nav', 'footer', 'sidebar', 'aside', with_tail=False)
+        
+        # Get text from main content areas, preferring main, then article, then body
+        candidates = {element.tag: element for element in _MAIN_CONTENT_XP(tree)}
+        for tag in ('main', 'article', 'body'):
+            if tag in candidates:
+                text = candidates[tag].text_content()
+                break
         else:
-            text = soup.get_text()
+            text = tree.text_content()
             
-        # Clean up text
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        # Clean up text: collapse whitespace runs
+        return ' '.join(text.split())
         
-    def extract_links_text(self, soup):
+    def extract_links_text(self, tree):
         """Extract anchor text from links"""
         links_text = []
-        for link in soup.find_all('a', href=True):
-            text = link.get_text().strip()
+        for link in _LINKS_XP(tree):
+            text = link.text_content().strip()
             if text:
                 links_text.append(text)
         return ' '.join(links_text)
         
-    def extract_images(self, soup, base_url):
+    def extract_images(self, tree, base_url):
         """Extract image information"""
         images = []
-        for img in soup.find_all('img'):
+        for img in _IMAGES_XP(tree):
             src = img.get('src')
             if src:
                 images.append({
@@ -98,12 +161,12 @@ class ContentExtractor:
         
     def count_words(self, text):
         """Count words in text"""
-        words = re.findall(r'\b\w+\b', text.lower())
+        words = _WORD_RE.findall(text)
         return len(words)
         
-    def detect_language(self, soup):
+    def detect_language(self, tree):
         """Detect page language"""
-        html_tag = soup.find('html')
-        if html_tag and html_tag.get('lang'):
-            return html_tag['lang']
+        lang = tree.get('lang')
+        if lang:
+            return lang
         return 'en'  # Default to English
@@ -1,62 +1,139 @@
 import heapq
+import threading
 import time
-from collections import defaultdict, deque
-from urllib.parse import urlparse
+from collections import defaultdict
+from functools import lru_cache
+from urllib.parse import urlsplit
 import redis
 from config.settings import Config
 
+@lru_cache(maxsize=100_000)
+def _split(url):
+    """Split a URL, caching results since the same links are seen over and over"""
+    return urlsplit(url)
+
 class URLFrontier:
+    """Two-level frontier: a heap of domains keyed by the time they may next
+    be fetched, and a priority heap of URLs per domain.
+    
+    Popping a URL costs O(log D) in the number of queued domains and never
+    re-queues URLs that are waiting on their domain's crawl delay.
+    
+    Methods never await, so coroutines on one event loop cannot interleave
+    inside them; the lock makes the frontier safe to share across threads.
+    """
     def __init__(self):
-        self.priority_queue = []
-        self.domain_queues = defaultdict(deque)
+        self.ready_heap = []  # [(next_eligible_time, domain)], one per queued domain
+        self.domain_queues = defaultdict(list)  # domain -> heap of (priority, timestamp, url)
+        self.queued_count = 0
         self.domain_last_access = defaultdict(float)
         self.crawled_urls = set()
         self.robots_cache = {}
         self.redis_client = redis.from_url(Config.REDIS_URL)
+        self._lock = threading.Lock()  # guards the in-memory queues
         
     def add_url(self, url, priority=1):
         """Add URL to frontier with priority"""
+        return bool(self.add_urls([url], priority))
+        
+    def add_urls(self, urls, priority=1):
+        """Add several URLs to frontier with one Redis round-trip"""
+        with self._lock:
+            added = [url for url in urls if self._enqueue(url, priority)]
+        
+        # Store in Redis for persistence
+        if added:
+            self.redis_client.sadd('frontier_urls', *added)
+        return added
+        
+    def _enqueue(self, url, priority):
+        """Add URL to the in-memory queues"""
         if url in self.crawled_urls:
             return False
             
-        domain = urlparse(url).netloc
+        domain = _split(url).netloc
+        queue = self.domain_queues[domain]
         
-        # Add to priority queue and domain-specific queue
-        heapq.heappush(self.priority_queue, (priority, time.time(), url))
-        self.domain_queues[domain].append(url)
-        
-        # Store in Redis for persistence
-        self.redis_client.sadd('frontier_urls', url)
+        # A domain joins the ready heap when it gets its first queued URL
+        if not queue:
+            next_time = self.domain_last_access.get(domain, 0) + Config.CRAWL_DELAY
+            heapq.heappush(self.ready_heap, (next_time, domain))
+            
+        heapq.heappush(queue, (priority, time.time(), url))
+        self.queued_count += 1
         return True
         
     def get_next_url(self):
         """Get next URL respecting politeness policies"""
+        urls = self.get_next_urls(1)
+        return urls[0] if urls else None
+        
+    def get_next_urls(self, count):
+        """Get up to count URLs with one Redis round-trip"""
+        urls = []
+        with self._lock:
+            while len(urls) < count:
+                url = self._dequeue()
+                if url is None:
+                    break
+                urls.append(url)
+            
+        # Remove from Redis
+        if urls:
+            self.redis_client.srem('frontier_urls', *urls)
+        return urls
+        
+    def _dequeue(self):
+        """Pop the next URL from the in-memory queues"""
         current_time = time.time()
         
-        while self.priority_queue:
-            priority, timestamp, url = heapq.heappop(self.priority_queue)
-            domain = urlparse(url).netloc
+        while self.ready_heap:
+            next_time, domain = self.ready_heap[0]
+            
+            # Every queued domain is still within its crawl delay
+            if next_time > current_time:
+                return None
+                
+            heapq.heappop(self.ready_heap)
+            queue = self.domain_queues[domain]
             
-            # Check if we need to wait for this domain
-            last_access = self.domain_last_access.get(domain, 0)
-            if current_time - last_access < Config.CRAWL_DELAY:
-                # Re-add to queue with updated timestamp
-                heapq.heappush(self.priority_queue, 
-                             (priority, current_time + Config.CRAWL_DELAY, url))
+            # Drop URLs crawled since they were queued; they must not use
+            # up the domain's crawl delay
+            url = None
+            while queue:
+                priority, timestamp, url = heapq.heappop(queue)
+                self.queued_count -= 1
+                if url not in self.crawled_urls:
+                    break
+                url = None
+                
+            if url is None:
+                del self.domain_queues[domain]
                 continue
                 
+            # Reschedule the domain while it still has URLs
+            if queue:
+                heapq.heappush(self.ready_heap, (current_time + Config.CRAWL_DELAY, domain))
+            else:
+                del self.domain_queues[domain]
+                
             # Update last access time
             self.domain_last_access[domain] = current_time
             self.crawled_urls.add(url)
-            
-            # Remove from Redis
-            self.redis_client.srem('frontier_urls', url)
             return url
             
         return None
         
+    def time_until_ready(self):
+        """Seconds until the next queued domain may be fetched, None if empty"""
+        with self._lock:
+            if not self.ready_heap:
+                return None
+            next_time = self.ready_heap[0][0]
+        return max(0.0, next_time - time.time())
+        
     def is_empty(self):
-        return len(self.priority_queue) == 0
+        return self.queued_count == 0
         
     def size(self):
-        return len(self.priority_queue)
+        return self.queued_count
@@ -1,96 +1,454 @@
+from bisect import bisect_left
 from collections import defaultdict
 import json
-import pickle
+import mmap
+import os
 from typing import Dict, List, Tuple
+import marisa_trie
+import msgpack
+import numpy as np
+from config.settings import Config
+
+BLOCK_SIZE = 128  # postings per compressed block
+END_OF_POSTINGS = 2 ** 32  # cursor position once a posting list is exhausted
+
+# On-disk layout written by InvertedIndex.save_to_file
+TERMS_FILE = 'terms.fst'  # marisa trie: term -> term id
+POSTINGS_FILE = 'postings.bin'  # serialized posting lists, concatenated
+OFFSETS_FILE = 'offsets.bin'  # uint64 start of each term id's postings, plus the end
+METADATA_FILE = 'metadata.msgpack'  # corpus statistics and document ids
+
+def _bit_width(values: np.ndarray) -> int:
+    """Number of bits needed to store the largest value"""
+    return int(values.max()).bit_length() if len(values) else 0
+
+def _pack_bits(values: np.ndarray, bits: int) -> bytes:
+    """Bitpack unsigned integers using a fixed number of bits each"""
+    if bits == 0:
+        return b''
+    shifts = np.arange(bits, dtype=np.uint32)
+    bit_matrix = ((values[:, None] >> shifts) & 1).astype(np.uint8)
+    return np.packbits(bit_matrix, bitorder='little').tobytes()
+
+def _unpack_bits(data: bytes, bits: int, count: int) -> np.ndarray:
+    """Unpack integers written by _pack_bits"""
+    if bits == 0:
+        return np.zeros(count, dtype=np.uint32)
+    bit_matrix = np.unpackbits(np.frombuffer(data, dtype=np.uint8),
+                               count=count * bits, bitorder='little')
+    weights = np.left_shift(np.uint32(1), np.arange(bits, dtype=np.uint32))
+    return (bit_matrix.reshape(count, bits) * weights).sum(axis=1, dtype=np.uint32)
+
+class PostingList:
+    """Compressed postings of a single term, sorted by document number.
+    
+    Postings are stored in blocks of BLOCK_SIZE. Each block has a header
+    (first_doc, last_doc, count, doc_bits, freq_bits), the bitpacked d-gaps
+    of its document numbers and its bitpacked term frequencies. Positions
+    live in a separate per-block stream that is only read when asked for.
+    """
+    def __init__(self):
+        self.headers = []  # [(first_doc, last_doc, count, doc_bits, freq_bits)]
+        self.last_docs = []  # last document number of each block, for skipping
+        self.doc_blocks = []
+        self.freq_blocks = []
+        self.position_blocks = []  # flat positions array per block
+        self.block_max_tfs = []  # highest term frequency per block, for score bounds
+        self.length = 0
+        
+    @property
+    def max_tf(self):
+        return max(self.block_max_tfs, default=0)
+        
+    def __len__(self):
+        return self.length
+        
+    def append(self, postings: List[Tuple[int, int, List[int]]]):
+        """Append postings whose document numbers follow the existing ones"""
+        docs = np.array([doc for doc, tf, positions in postings], dtype=np.uint32)
+        freqs = np.array([tf for doc, tf, positions in postings], dtype=np.uint32)
+        positions = np.array([pos for doc, tf, positions in postings for pos in positions],
+                             dtype=np.uint32)
+        
+        # Refill a trailing partial block before starting new ones
+        if self.headers and self.headers[-1][2] < BLOCK_SIZE:
+            last_docs, last_freqs = self.decode_block(len(self.headers) - 1)
+            last_positions = self.position_blocks[-1]
+            self._pop_block()
+            docs = np.concatenate([last_docs, docs])
+            freqs = np.concatenate([last_freqs, freqs])
+            positions = np.concatenate([last_positions, positions])
+            
+        position_ends = np.cumsum(freqs)
+        for start in range(0, len(docs), BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, len(docs))
+            pos_start = int(position_ends[start - 1]) if start else 0
+            pos_end = int(position_ends[end - 1])
+            self._push_block(docs[start:end], freqs[start:end], positions[pos_start:pos_end])
+    
+    def _push_block(self, docs: np.ndarray, freqs: np.ndarray, positions: np.ndarray):
+        """Encode and store a single block"""
+        # d-gaps: d_i = doc_i - doc_{i-1}, the first doc is kept in the header
+        gaps = np.diff(docs, prepend=docs[0])
+        doc_bits = _bit_width(gaps)
+        doc_data = _pack_bits(gaps, doc_bits)
+        freq_bits = _bit_width(freqs)
+        
+        self.headers.append((int(docs[0]), int(docs[-1]), len(docs), doc_bits, freq_bits))
+        self.last_docs.append(int(docs[-1]))
+        self.doc_blocks.append(doc_data)
+        self.freq_blocks.append(_pack_bits(freqs, freq_bits))
+        self.position_blocks.append(positions)
+        self.block_max_tfs.append(int(freqs.max()))
+        self.length += len(docs)
+        
+    def _pop_block(self):
+        """Remove the last block"""
+        self.length -= self.headers[-1][2]
+        for blocks in (self.headers, self.last_docs, self.doc_blocks,
+                       self.freq_blocks, self.position_blocks, self.block_max_tfs):
+            blocks.pop()
+    
+    def decode_block(self, block: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Decode document numbers and term frequencies of a block"""
+        first_doc, last_doc, count, doc_bits, freq_bits = self.headers[block]
+        gaps = _unpack_bits(self.doc_blocks[block], doc_bits, count)
+        docs = np.cumsum(gaps, dtype=np.uint32) + np.uint32(first_doc)
+        freqs = _unpack_bits(self.freq_blocks[block], freq_bits, count)
+        return docs, freqs
+        
+    def decode_positions(self, block: int) -> List[List[int]]:
+        """Decode positions of each posting in a block"""
+        count, freqs = self.headers[block][2], self.decode_block(block)[1]
+        ends = np.cumsum(freqs)
+        return np.split(self.position_blocks[block], ends[:-1]) if count else []
+        
+    def get_frequency(self, doc: int) -> int:
+        """Get term frequency in a document, skipping non-matching blocks"""
+        block = bisect_left(self.last_docs, doc)
+        if block == len(self.last_docs) or self.headers[block][0] > doc:
+            return 0
+        docs, freqs = self.decode_block(block)
+        i = int(np.searchsorted(docs, doc))
+        return int(freqs[i]) if docs[i] == doc else 0
+        
+    def postings(self, with_positions=True):
+        """Iterate over (doc, tf, positions) tuples in document order"""
+        for block in range(len(self.headers)):
+            docs, freqs = self.decode_block(block)
+            if with_positions:
+                positions = self.decode_positions(block)
+            else:
+                positions = [None] * len(docs)
+            for doc, tf, pos in zip(docs.tolist(), freqs.tolist(), positions):
+                yield doc, tf, pos.tolist() if pos is not None else None
+                
+    def cursor(self):
+        return PostingCursor(self)
+        
+    def to_bytes(self) -> bytes:
+        """Serialize the encoded blocks without decoding them.
+        
+        Layout (all uint32 unless noted): block count, headers, block max
+        tfs, position counts, positions, then the doc and frequency bytes.
+        The result is padded to a multiple of 4 bytes.
+        """
+        table = np.array([len(self.headers)]
+                         + [value for header in self.headers for value in header]
+                         + self.block_max_tfs
+                         + [len(positions) for positions in self.position_blocks],
+                         dtype=np.uint32)
+        positions = np.concatenate(self.position_blocks).astype(np.uint32, copy=False) \
+            if self.position_blocks else np.zeros(0, dtype=np.uint32)
+        data = b''.join([table.tobytes(), positions.tobytes(),
+                         *self.doc_blocks, *self.freq_blocks])
+        return data + b'\0' * (-len(data) % 4)
+        
+    @classmethod
+    def from_buffer(cls, buffer) -> 'PostingList':
+        """Rebuild a posting list written by to_bytes.
+        
+        Blocks and positions stay views into buffer (e.g. a mapped file)
+        and are only decoded when read.
+        """
+        posting_list = cls()
+        block_count = int(np.frombuffer(buffer, dtype=np.uint32, count=1)[0])
+        table = np.frombuffer(buffer, dtype=np.uint32, count=7 * block_count, offset=4)
+        headers = table[:5 * block_count].reshape(block_count, 5)
+        position_counts = table[6 * block_count:]
+        offset = 4 + table.nbytes
+        
+        posting_list.headers = [tuple(header) for header in headers.tolist()]
+        posting_list.last_docs = headers[:, 1].tolist()
+        posting_list.block_max_tfs = table[5 * block_count:6 * block_count].tolist()
+        posting_list.length = int(headers[:, 2].sum())
+        
+        for count in position_counts.tolist():
+            posting_list.position_blocks.append(
+                np.frombuffer(buffer, dtype=np.uint32, count=count, offset=offset))
+            offset += 4 * count
+        for blocks, bits_field in ((posting_list.doc_blocks, 3), (posting_list.freq_blocks, 4)):
+            for header in posting_list.headers:
+                size = (header[2] * header[bits_field] + 7) // 8
+                blocks.append(buffer[offset:offset + size])
+                offset += size
+        return posting_list
+
+class PostingCursor:
+    """Forward-only cursor over a posting list, decoding one block at a time"""
+    def __init__(self, posting_list: PostingList):
+        self.posting_list = posting_list
+        self.doc = END_OF_POSTINGS
+        self.tf = 0
+        self._load_block(0)
+        
+    def _load_block(self, block: int):
+        """Position the cursor on the first posting of a block"""
+        self.block = block
+        if block >= len(self.posting_list.headers):
+            self.doc = END_OF_POSTINGS
+            self.tf = 0
+            return
+        docs, freqs = self.posting_list.decode_block(block)
+        self.docs = docs.tolist()
+        self.freqs = freqs.tolist()
+        self._set(0)
+        
+    def _set(self, i: int):
+        self.i = i
+        self.doc = self.docs[i]
+        self.tf = self.freqs[i]
+        
+    def next(self):
+        """Advance to the next posting"""
+        if self.doc == END_OF_POSTINGS:
+            return
+        if self.i + 1 < len(self.docs):
+            self._set(self.i + 1)
+        else:
+            self._load_block(self.block + 1)
+            
+    def next_geq(self, target: int):
+        """Advance to the first posting with document number >= target"""
+        if self.doc >= target or self.doc == END_OF_POSTINGS:
+            return
+        last_docs = self.posting_list.last_docs
+        if target > last_docs[self.block]:
+            # Skip whole blocks using their headers
+            self._load_block(bisect_left(last_docs, target, self.block + 1))
+            if self.doc >= target or self.doc == END_OF_POSTINGS:
+                return
+        self._set(bisect_left(self.docs, target, self.i))
+        
+    def block_bound(self, target: int) -> Tuple[int, int]:
+        """Get (max tf, last doc) of the block that would hold target, without decoding it"""
+        last_docs = self.posting_list.last_docs
+        block = bisect_left(last_docs, target, min(self.block, len(last_docs)))
+        if block == len(last_docs):
+            return 0, END_OF_POSTINGS
+        return self.posting_list.block_max_tfs[block], last_docs[block]
 
 class InvertedIndex:
     def __init__(self):
-        self.index = defaultdict(list)  # term -> [(doc_id, tf, positions)]
-        self.document_freq = defaultdict(int)  # term -> document frequency
+        self.index = []  # term id -> compressed postings, None until read from a mapped file
+        self.pending = defaultdict(list)  # term id -> [(doc, tf, positions)] not yet committed
+        self.document_freq = np.zeros(0, dtype=np.int32)  # term id -> committed document frequency
         self.total_docs = 0
         self.doc_lengths = {}  # doc_id -> document length
+        self.doc_ids = []  # doc number -> doc_id
+        self.doc_numbers = {}  # doc_id -> doc number
+        self.term_ids = {}  # term -> term id
+        self.terms = []  # term id -> term
+        self.idf = np.zeros(0, dtype=np.float32)  # term id -> inverse document frequency
+        self.idf_total_docs = 0  # corpus size the IDF table was computed for
+        self.postings_buffer = None  # mapped postings file of a loaded index
+        self.offsets = None  # mapped term id -> offset into postings_buffer
         
     def add_document(self, doc_id: str, tokens: List[str]):
         """Add a document to the inverted index"""
         if doc_id in self.doc_lengths:
             return  # Document already indexed
             
-        # Calculate term frequencies and positions
+        # Documents are numbered in insertion order so postings stay sorted
+        doc_number = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_numbers[doc_id] = doc_number
+        
+        # Calculate term frequencies and positions, keyed by term id
         term_positions = defaultdict(list)
         term_freq = defaultdict(int)
+        term_ids = self.term_ids
         
         for position, token in enumerate(tokens):
             if len(token) >= 2:  # Ignore very short terms
-                term_freq[token] += 1
-                term_positions[token].append(position)
+                term_id = term_ids.setdefault(token, len(self.terms))
+                if term_id == len(self.terms):
+                    self.terms.append(token)
+                    self.index.append(PostingList())
+                term_freq[term_id] += 1
+                term_positions[term_id].append(position)
         
-        # Add to inverted index
-        for term, freq in term_freq.items():
-            positions = term_positions[term]
-            self.index[term].append((doc_id, freq, positions))
-            
-        # Update document frequency
-        unique_terms = set(term_freq.keys())
-        for term in unique_terms:
-            self.document_freq[term] += 1
+        # Buffer postings until the next commit, which also counts document frequency
+        for term_id, freq in term_freq.items():
+            positions = term_positions[term_id]
+            self.pending[term_id].append((doc_number, freq, positions))
             
         # Store document length
         self.doc_lengths[doc_id] = len(tokens)
         self.total_docs += 1
         
+        if len(self.pending) and self.total_docs % Config.INDEX_BATCH_SIZE == 0:
+            self.commit()
+    
+    def commit(self):
+        """Compress buffered postings into the per-term posting lists"""
+        new_terms = len(self.terms) - len(self.document_freq)
+        if new_terms:
+            self.document_freq = np.concatenate([self.document_freq, np.zeros(new_terms, dtype=np.int32)])
+            
+        for term_id, postings in self.pending.items():
+            self.document_freq[term_id] += len(postings)
+            self.get_posting_list(term_id).append(postings)
+        self.pending.clear()
+        
+        # Every document changes the corpus size, so refresh the whole IDF table
+        if self.idf_total_docs != self.total_docs:
+            self.idf = np.log(self.total_docs / self.document_freq.astype(np.float64)).astype(np.float32)
+            self.idf_total_docs = self.total_docs
+            
+    def get_posting_list(self, term_id: int) -> PostingList:
+        """Get a term's posting list, reading it from the mapped postings file on first use"""
+        posting_list = self.index[term_id]
+        if posting_list is None:
+            start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+            posting_list = PostingList.from_buffer(self.postings_buffer[start:end])
+            self.index[term_id] = posting_list
+        return posting_list
+        
+    def get_idf(self, term: str) -> float:
+        """Get inverse document frequency of a term"""
+        self.commit()
+        term_id = self.term_ids.get(term)
+        return float(self.idf[term_id]) if term_id is not None else 0.0
+        
+    def get_idfs(self, terms: List[str]) -> np.ndarray:
+        """Gather inverse document frequencies of several terms"""
+        self.commit()
+        term_ids = np.array([self.term_ids.get(term, -1) for term in terms], dtype=np.int64)
+        idfs = np.zeros(len(terms), dtype=np.float32)
+        known = term_ids >= 0
+        idfs[known] = self.idf[term_ids[known]]
+        return idfs
+        
+    def get_cursor(self, term: str):
+        """Get a posting cursor for a term, or None if the term is not indexed"""
+        self.commit()
+        term_id = self.term_ids.get(term)
+        if term_id is not None:
+            return self.get_posting_list(term_id).cursor()
+        return None
+        
     def search(self, terms: List[str]) -> Dict[str, List[Tuple]]:
         """Search for documents containing the terms"""
+        self.commit()
         results = {}
         for term in terms:
-            if term in self.index:
-                results[term] = self.index[term]
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                results[term] = [(self.doc_ids[doc], tf, positions)
+                                 for doc, tf, positions in self.get_posting_list(term_id).postings()]
             else:
                 results[term] = []
         return results
         
     def get_document_frequency(self, term: str) -> int:
         """Get document frequency for a term"""
-        return self.document_freq.get(term, 0)
+        self.commit()
+        term_id = self.term_ids.get(term)
+        return int(self.document_freq[term_id]) if term_id is not None else 0
         
     def get_term_frequency(self, term: str, doc_id: str) -> int:
         """Get term frequency in a specific document"""
-        if term in self.index:
-            for doc, tf, positions in self.index[term]:
-                if doc == doc_id:
-                    return tf
+        self.commit()
+        term_id = self.term_ids.get(term)
+        if term_id is not None and doc_id in self.doc_numbers:
+            return self.get_posting_list(term_id).get_frequency(self.doc_numbers[doc_id])
         return 0
         
     def get_document_length(self, doc_id: str) -> int:
         """Get the length of a document"""
         return self.doc_lengths.get(doc_id, 0)
         
-    def save_to_file(self, filepath: str):
-        """Save index to file"""
+    def save_to_file(self, directory: str):
+        """Save index to a directory of flat files that load_from_file maps into memory"""
+        self.commit()
+        os.makedirs(directory, exist_ok=True)
+        
+        # Write next to the old files and swap them in, so a currently
+        # mapped postings file stays valid for the posting lists reading it
+        offsets = np.zeros(len(self.terms) + 1, dtype=np.uint64)
+        with open(os.path.join(directory, POSTINGS_FILE + '.tmp'), 'wb') as f:
+            for term_id in range(len(self.terms)):
+                f.write(self.get_posting_list(term_id).to_bytes())
+                offsets[term_id + 1] = f.tell()
+        offsets.tofile(os.path.join(directory, OFFSETS_FILE + '.tmp'))
+        
+        marisa_trie.RecordTrie('<I', ((term, (term_id,)) for term_id, term in enumerate(self.terms))) \
+            .save(os.path.join(directory, TERMS_FILE + '.tmp'))
+        
         index_data = {
-            'index': dict(self.index),
-            'document_freq': dict(self.document_freq),
+            'document_freq': self.document_freq.tolist(),
             'total_docs': self.total_docs,
-            'doc_lengths': self.doc_lengths
+            'doc_lengths': self.doc_lengths,
+            'doc_ids': self.doc_ids
         }
-        
-        with open(filepath, 'wb') as f:
-            pickle.dump(index_data, f)
+        with open(os.path.join(directory, METADATA_FILE + '.tmp'), 'wb') as f:
+            f.write(msgpack.packb(index_data, use_bin_type=True))
             
-    def load_from_file(self, filepath: str):
-        """Load index from file"""
-        with open(filepath, 'rb') as f:
-            index_data = pickle.load(f)
+        for filename in (POSTINGS_FILE, OFFSETS_FILE, TERMS_FILE, METADATA_FILE):
+            path = os.path.join(directory, filename)
+            os.replace(path + '.tmp', path)
+    
+    def load_from_file(self, directory: str):
+        """Load index from a directory written by save_to_file.
+        
+        Postings and offsets are memory-mapped; a term's posting list is
+        only read, block by block, when it is first queried.
+        """
+        trie = marisa_trie.RecordTrie('<I').mmap(os.path.join(directory, TERMS_FILE))
+        with open(os.path.join(directory, METADATA_FILE), 'rb') as f:
+            # Document ids may be ints, which become map keys in doc_lengths
+            index_data = msgpack.unpackb(f.read(), raw=False, strict_map_key=False)
             
-        self.index = defaultdict(list, index_data['index'])
-        self.document_freq = defaultdict(int, index_data['document_freq'])
+        self.terms = [None] * len(trie)
+        for term, (term_id,) in trie.items():
+            self.terms[term_id] = term
+        self.term_ids = {term: term_id for term_id, term in enumerate(self.terms)}
+        
+        postings_path = os.path.join(directory, POSTINGS_FILE)
+        if os.path.getsize(postings_path):
+            with open(postings_path, 'rb') as f:
+                self.postings_buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            self.postings_buffer = memoryview(b'')
+        self.offsets = np.memmap(os.path.join(directory, OFFSETS_FILE), dtype=np.uint64, mode='r')
+        
+        self.index = [None] * len(self.terms)
+        self.pending = defaultdict(list)
+        self.document_freq = np.array(index_data['document_freq'], dtype=np.int32)
         self.total_docs = index_data['total_docs']
         self.doc_lengths = index_data['doc_lengths']
+        self.doc_ids = index_data['doc_ids']
+        self.doc_numbers = {doc_id: number for number, doc_id in enumerate(self.doc_ids)}
+        self.idf_total_docs = 0
+        self.commit()
         
     def get_stats(self):
         """Get index statistics"""
+        self.commit()
         return {
             'total_documents': self.total_docs,
-            'unique_terms': len(self.index),
-            'total_postings': sum(len(postings) for postings in self.index.values()),
+            'unique_terms': len(self.terms),
+            'total_postings': int(self.document_freq.sum()),
             'average_doc_length': sum(self.doc_lengths.values()) / len(self.doc_lengths) if self.doc_lengths else 0
         }
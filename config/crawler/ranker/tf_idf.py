@@ -1,6 +1,9 @@
+import heapq
 import math
+from collections import Counter
 from typing import List, Dict, Tuple
-from indexer.inverted_index import InvertedIndex
+from indexer.inverted_index import InvertedIndex, END_OF_POSTINGS
+from config.settings import Config
 
 class TFIDFScorer:
     def __init__(self, inverted_index: InvertedIndex):
@@ -20,11 +23,8 @@ class TFIDFScorer:
             
     def calculate_idf(self, term: str) -> float:
         """Calculate inverse document frequency"""
-        doc_freq = self.index.get_document_frequency(term)
-        if doc_freq == 0:
-            return 0
-            
-        return math.log(self.index.total_docs / doc_freq)
+        # Precomputed for every term on index commit
+        return self.index.get_idf(term)
         
     def calculate_tfidf(self, term: str, doc_id: str) -> float:
         """Calculate TF-IDF score for a term in a document"""
@@ -49,26 +49,82 @@ class TFIDFScorer:
         # Normalize by query length
         return total_score / len(query_terms) if query_terms else 0
         
-    def score_documents(self, query_terms: List[str], candidate_docs: List[str]) -> List[Tuple[str, float]]:
-        """Score multiple documents for query terms"""
-        scored_docs = []
+    def score_documents(self, query_terms: List[str], k: int = Config.DEFAULT_RESULTS_COUNT) -> List[Tuple[str, float]]:
+        """Score documents for query terms and return the top k
         
-        for doc_id in candidate_docs:
-            score = self.score_document(query_terms, doc_id)
-            if score > 0:
-                scored_docs.append((doc_id, score))
+        Traverses the query terms' posting lists document-at-a-time with one
+        cursor per term, so only the best k scores are kept in memory.
+        Block-Max WAND skips documents whose score upper bound cannot enter
+        the current top k.
+        """
+        if not query_terms or k <= 0:
+            return []
+            
+        # Open a cursor per distinct term; repeated terms weigh more. The
+        # log-normalized TF only depends on the frequency, so a list's
+        # highest frequency bounds the term's contribution.
+        term_counts = Counter(query_terms)
+        idf_scores = self.index.get_idfs(list(term_counts)).tolist()
+        cursors = []  # [(cursor, weight, upper bound)]
+        for (term, count), idf_score in zip(term_counts.items(), idf_scores):
+            cursor = self.index.get_cursor(term)
+            if cursor is not None and idf_score > 0:
+                weight = count * idf_score
+                upper_bound = self.calculate_tf(cursor.posting_list.max_tf, 0) * weight
+                cursors.append((cursor, weight, upper_bound))
                 
-        # Sort by score descending
-        return sorted(scored_docs, key=lambda x: x[1], reverse=True)
-        
-    def get_candidate_documents(self, query_terms: List[str]) -> set:
-        """Get all documents that contain at least one query term"""
-        candidate_docs = set()
-        
-        for term in query_terms:
-            search_results = self.index.search([term])
-            if term in search_results:
-                for doc_id, tf, positions in search_results[term]:
-                    candidate_docs.add(doc_id)
+        top_k = []  # min-heap of (score, -doc)
+        while True:
+            threshold = top_k[0][0] if len(top_k) == k else 0
+            cursors.sort(key=lambda entry: entry[0].doc)
+            
+            # Pivot: first cursor where the summed upper bounds beat the threshold
+            pivot = None
+            bound_sum = 0
+            for i, (cursor, weight, upper_bound) in enumerate(cursors):
+                if cursor.doc == END_OF_POSTINGS:
+                    break
+                bound_sum += upper_bound
+                if bound_sum > threshold:
+                    pivot = i
+                    break
+            if pivot is None:
+                break
+                
+            pivot_doc = cursors[pivot][0].doc
+            while pivot + 1 < len(cursors) and cursors[pivot + 1][0].doc == pivot_doc:
+                pivot += 1
+                
+            # Tighter bound from the blocks that would hold the pivot document
+            block_sum = 0
+            next_doc = cursors[pivot + 1][0].doc if pivot + 1 < len(cursors) else END_OF_POSTINGS
+            for cursor, weight, upper_bound in cursors[:pivot + 1]:
+                block_max_tf, block_last_doc = cursor.block_bound(pivot_doc)
+                block_sum += self.calculate_tf(block_max_tf, 0) * weight
+                next_doc = min(next_doc, block_last_doc + 1)
+                
+            if block_sum <= threshold:
+                # Nothing before the end of these blocks can enter the top k
+                for cursor, weight, upper_bound in cursors[:pivot + 1]:
+                    cursor.next_geq(min(next_doc, END_OF_POSTINGS))
+            elif cursors[0][0].doc == pivot_doc:
+                # All cursors up to the pivot are on it: score the document
+                doc_length = self.index.get_document_length(self.index.doc_ids[pivot_doc])
+                total_score = 0
+                for cursor, weight, upper_bound in cursors[:pivot + 1]:
+                    total_score += self.calculate_tf(cursor.tf, doc_length) * weight
+                    cursor.next()
+                    
+                entry = (total_score, -pivot_doc)
+                if len(top_k) < k:
+                    heapq.heappush(top_k, entry)
+                elif entry > top_k[0]:
+                    heapq.heapreplace(top_k, entry)
+            else:
+                # Documents before the pivot cannot enter the top k
+                for cursor, weight, upper_bound in cursors[:pivot]:
+                    cursor.next_geq(pivot_doc)
                     
-        return candidate_docs
+        # Sort by score descending, normalized by query length
+        return [(self.index.doc_ids[-negated_doc], score / len(query_terms))
+                for score, negated_doc in sorted(top_k, reverse=True) if score > 0]
@@ -1,65 +1,119 @@
 import asyncio
 import aiohttp
+import os
 import time
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+from urllib.parse import urljoin, urlsplit
 import logging
 from .url_frontier import URLFrontier
-from .content_extractor import ContentExtractor
+from .content_extractor import ContentExtractor, parse_html
 from .robots_parser import RobotsParser
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+_content_extractor = ContentExtractor()
+_LINKS_XP = etree.XPath('//a[@href]')
+
+def extract_links_from_tree(tree, base_url):
+    """Extract links from an already parsed page"""
+    links = []
+    
+    for link in _LINKS_XP(tree):
+        href = link.get('href')
+        absolute_url = urljoin(base_url, href)
+        
+        # Filter out non-HTTP links
+        parsed = urlsplit(absolute_url)
+        if parsed.scheme in ('http', 'https'):
+            links.append({
+                'url': absolute_url,
+                'anchor_text': link.text_content().strip(),
+                'title': link.get('title', '')
+            })
+            
+    return links
+
+def parse_page(html_content, url, encoding=None):
+    """Parse a page once and return (extracted content, links)
+    
+    Runs in the crawler's process pool, so it must stay module-level.
+    html_content may be raw bytes; without an encoding, it is taken
+    from the document's <meta charset> or detected by charset-normalizer.
+    """
+    tree = parse_html(html_content, encoding)
+    
+    # Extract links before the content extractor strips nav/footer elements
+    links = extract_links_from_tree(tree, url)
+    extracted_data = _content_extractor.extract_from_tree(tree, url)
+    return extracted_data, links
+
 class WebCrawler:
     def __init__(self, max_concurrent=10):
         self.url_frontier = URLFrontier()
-        self.content_extractor = ContentExtractor()
         self.robots_parser = RobotsParser()
         self.max_concurrent = max_concurrent
         self.crawled_count = 0
         
+        # Parsing is CPU-bound, keep it off the event loop
+        self._parse_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        
+    def close(self):
+        """Shut down the parsing worker processes"""
+        self._parse_pool.shutdown()
+        
     async def crawl(self, seed_urls):
         """Main crawling loop"""
         # Add seed URLs to frontier
-        for url in seed_urls:
-            self.url_frontier.add_url(url, priority=1)
+        self.url_frontier.add_urls(seed_urls, priority=1)
             
         # Create semaphore for concurrency control
         semaphore = asyncio.Semaphore(self.max_concurrent)
         
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
-            headers={'User-Agent': Config.USER_AGENT}
-        ) as session:
+        try:
+            async with aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
+                headers={'User-Agent': Config.USER_AGENT}
+            ) as session:
             
-            tasks = []
-            while not self.url_frontier.is_empty() or tasks:
-                # Start new tasks if we have capacity
-                while len(tasks) < self.max_concurrent and not self.url_frontier.is_empty():
-                    url = self.url_frontier.get_next_url()
-                    if url:
-                        task = asyncio.create_task(
-                            self.crawl_page(session, semaphore, url)
-                        )
-                        tasks.append(task)
+                tasks = []
+                while not self.url_frontier.is_empty() or tasks:
+                    # Start new tasks if we have capacity
+                    if len(tasks) < self.max_concurrent:
+                        for url in self.url_frontier.get_next_urls(self.max_concurrent - len(tasks)):
+                            task = asyncio.create_task(
+                                self.crawl_page(session, semaphore, url)
+                            )
+                            tasks.append(task)
                 
-                # Wait for at least one task to complete
-                if tasks:
-                    done, pending = await asyncio.wait(
-                        tasks, return_when=asyncio.FIRST_COMPLETED
-                    )
-                    tasks = list(pending)
+                    # Wait for at least one task to complete, or, with a slot
+                    # free, for a queued domain's crawl delay to pass
+                    if tasks:
+                        if len(tasks) < self.max_concurrent:
+                            timeout = self.url_frontier.time_until_ready()
+                        else:
+                            timeout = None
+                        done, pending = await asyncio.wait(
+                            tasks, timeout=timeout,
+                            return_when=asyncio.FIRST_COMPLETED
+                        )
+                        tasks = list(pending)
                     
-                    # Process completed tasks
-                    for task in done:
-                        try:
-                            result = await task
-                            if result:
-                                await self.process_crawl_result(result)
-                        except Exception as e:
-                            logger.error(f"Task failed: {e}")
-                            
+                        # Process completed tasks
+                        for task in done:
+                            try:
+                                result = await task
+                                if result:
+                                    await self.process_crawl_result(result)
+                            except Exception as e:
+                                logger.error(f"Task failed: {e}")
+                    elif not self.url_frontier.is_empty():
+                        await asyncio.sleep(self.url_frontier.time_until_ready())
+        finally:
+            # robots.txt fetches share one session for the whole crawl
+            await self.robots_parser.close()
+            
     async def crawl_page(self, session, semaphore, url):
         """Crawl a single page"""
         async with semaphore:
@@ -75,54 +129,40 @@ class WebCrawler:
                         logger.warning(f"HTTP {response.status} for {url}")
                         return None
                         
-                    content = await response.text()
-                    
-                    # Extract content and metadata
-                    extracted_data = self.content_extractor.extract(content, url)
-                    
-                    # Extract links for further crawling
-                    links = self.extract_links(content, url)
-                    
-                    self.crawled_count += 1
-                    logger.info(f"Crawled {self.crawled_count}: {url}")
-                    
-                    return {
-                        'url': url,
-                        'content': extracted_data,
-                        'links': links,
-                        'status': response.status,
-                        'timestamp': time.time()
-                    }
+                    # Keep the raw bytes: lxml decodes them itself, and bytes
+                    # are cheaper to send to the worker than a decoded str
+                    content = await response.read()
+                    encoding = response.charset
+                    status = response.status
                     
+                # Extract content, metadata and links in a worker process
+                loop = asyncio.get_running_loop()
+                extracted_data, links = await loop.run_in_executor(
+                    self._parse_pool, parse_page, content, url, encoding)
+                
+                self.crawled_count += 1
+                logger.info(f"Crawled {self.crawled_count}: {url}")
+                
+                return {
+                    'url': url,
+                    'content': extracted_data,
+                    'links': links,
+                    'status': status,
+                    'timestamp': time.time()
+                }
+                
             except Exception as e:
                 logger.error(f"Error crawling {url}: {e}")
                 return None
                 
     def extract_links(self, html_content, base_url):
         """Extract links from HTML content"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        links = []
-        
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            absolute_url = urljoin(base_url, href)
-            
-            # Filter out non-HTTP links
-            parsed = urlparse(absolute_url)
-            if parsed.scheme in ('http', 'https'):
-                links.append({
-                    'url': absolute_url,
-                    'anchor_text': link.get_text().strip(),
-                    'title': link.get('title', '')
-                })
-                
-        return links
+        return extract_links_from_tree(parse_html(html_content), base_url)
         
     async def process_crawl_result(self, result):
         """Process crawled page result"""
-        # Add new URLs to frontier
-        for link in result['links']:
-            self.url_frontier.add_url(link['url'], priority=2)
+        # Add new URLs to frontier in one batch
+        self.url_frontier.add_urls([link['url'] for link in result['links']], priority=2)
             
         # Here you would typically:
         # 1. Store the document in database
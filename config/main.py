@@ -26,7 +26,10 @@ async def main():
     logger.info(f"Starting crawl with {len(seed_urls)} seed URLs")
     
     # Start crawling
-    await crawler.crawl(seed_urls)
+    try:
+        await crawler.crawl(seed_urls)
+    finally:
+        crawler.close()
     
     logger.info("Crawling completed!")
     logger.info(f"Index stats: {inverted_index.get_stats()}")
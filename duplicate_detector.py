@@ -1,81 +1,130 @@
-import hashlib
 import mmh3
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from collections import defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from datasketch import MinHash, MinHashLSH
 import redis
 from config.settings import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+SHINGLE_SIZE = 5
+_SHINGLE_BASE = 0x100000001B3
+# Polynomial weights of each word in a shingle, modulo 2**64
+_SHINGLE_POWERS = np.array([pow(_SHINGLE_BASE, SHINGLE_SIZE - 1 - i, 2 ** 64)
+                            for i in range(SHINGLE_SIZE)], dtype=np.uint64)
+
+# Query parameters that don't change page content
+_TRACKING_PARAMS = frozenset(['utm_source', 'utm_medium', 'utm_campaign',
+                              'utm_term', 'utm_content', 'ref', 'source'])
+
+def _identity_hash(value):
+    """Shingles are already 32-bit hashes, so MinHash can use them as-is"""
+    return value
+
 class DuplicateDetector:
-    def __init__(self):
+    def __init__(self, num_perm=128):
         self.redis_client = redis.from_url(Config.REDIS_URL)
         self.url_hashes = set()
-        self.content_hashes = set()
+        self.content_hashes = {}  # url -> sorted np.uint64 array of shingle hashes
         self.similarity_threshold = 0.85
+        self.num_perm = num_perm
+        self.content_lsh = MinHashLSH(threshold=self.similarity_threshold, num_perm=num_perm)
         
     def is_duplicate_url(self, url):
         """Check if URL is duplicate"""
         url_normalized = self.normalize_url(url)
         url_hash = self.hash_string(url_normalized)
         
-        # Check in Redis first
-        if self.redis_client.sismember('seen_urls', url_hash):
-            return True
-            
         # Check in local cache
         if url_hash in self.url_hashes:
             return True
             
-        # Add to both caches
+        # SADD adds nothing for a hash already in Redis, so a single
+        # command both checks and records it
+        if not self.redis_client.sadd('seen_urls', url_hash):
+            return True
+            
         self.url_hashes.add(url_hash)
-        self.redis_client.sadd('seen_urls', url_hash)
         return False
         
-    def is_duplicate_content(self, content, url):
-        """Check if content is duplicate using fingerprinting"""
+    def filter_duplicate_urls(self, urls):
+        """Return the URLs not seen before, checking the batch in one round-trip"""
+        url_hashes = {}
+        for url in urls:
+            url_hash = self.hash_string(self.normalize_url(url))
+            if url_hash not in self.url_hashes and url_hash not in url_hashes:
+                url_hashes[url_hash] = url
+                
+        if not url_hashes:
+            return []
+            
+        # SMISMEMBER (Redis >= 6.2) checks every hash before SADD records
+        # them; pipelined, both go in one round-trip
+        candidates = list(url_hashes)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.smismember('seen_urls', candidates)
+        pipeline.sadd('seen_urls', *candidates)
+        seen, _ = pipeline.execute()
+        new_hashes = [url_hash for url_hash, is_member in zip(candidates, seen) if not is_member]
+        
+        # Add to local cache
+        self.url_hashes.update(new_hashes)
+        return [url_hashes[url_hash] for url_hash in new_hashes]
+        
+    def is_duplicate_content(self, content, url, text=None):
+        """Check if content is duplicate using fingerprinting
+        
+        If the page text has already been extracted it can be passed as
+        ``text`` to skip parsing ``content`` again.
+        """
         # Create content fingerprint
-        fingerprint = self.create_content_fingerprint(content)
-        
-        # Check against existing fingerprints
-        for existing_fingerprint in self.content_hashes:
+        if text is not None:
+            fingerprint = self.create_text_fingerprint(text)
+        else:
+            fingerprint = self.create_content_fingerprint(content)
+            
+        # Too short to shingle, cannot be similar to anything
+        if not fingerprint.size:
+            return False
+        
+        # Only fingerprints sharing an LSH band are candidates; confirm
+        # those with the exact Jaccard similarity
+        minhash = self.create_minhash(fingerprint)
+        for candidate_url in self.content_lsh.query(minhash):
+            existing_fingerprint = self.content_hashes[candidate_url]
             similarity = self.calculate_similarity(fingerprint, existing_fingerprint)
             if similarity > self.similarity_threshold:
                 logger.info(f"Duplicate content detected for {url}")
                 return True
                 
         # Store new fingerprint
-        self.content_hashes.add(fingerprint)
-        self.redis_client.sadd('content_fingerprints', str(fingerprint))
+        if url not in self.content_hashes:
+            self.content_hashes[url] = fingerprint
+            self.content_lsh.insert(url, minhash)
+        self.redis_client.sadd('content_fingerprints', fingerprint.tobytes())
         return False
         
     def normalize_url(self, url):
         """Normalize URL for duplicate detection"""
-        from urllib.parse import urlparse, urlunparse
-        
-        parsed = urlparse(url.lower())
+        parsed = urlsplit(url.lower())
         
         # Remove common parameters that don't affect content
         if parsed.query:
             # Remove tracking parameters
-            tracking_params = ['utm_source', 'utm_medium', 'utm_campaign', 
-                             'utm_term', 'utm_content', 'ref', 'source']
-            query_parts = []
-            for param in parsed.query.split('&'):
-                if '=' in param:
-                    key, value = param.split('=', 1)
-                    if key not in tracking_params:
-                        query_parts.append(param)
-            normalized_query = '&'.join(sorted(query_parts))
+            pairs = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                     if key not in _TRACKING_PARAMS]
+            normalized_query = urlencode(sorted(pairs))
         else:
             normalized_query = ''
             
         # Remove fragment
-        normalized = urlunparse((
+        normalized = urlunsplit((
             parsed.scheme,
             parsed.netloc,
             parsed.path.rstrip('/'),
-            parsed.params,
             normalized_query,
             ''  # Remove fragment
         ))
@@ -86,39 +135,57 @@ class DuplicateDetector:
         """Create content fingerprint using shingling"""
         # Remove HTML tags and normalize text
         from bs4 import BeautifulSoup
-        import re
         
-        soup = BeautifulSoup(content, 'html.parser')
-        text = soup.get_text()
-        text = re.sub(r'\s+', ' ', text).lower().strip()
+        soup = BeautifulSoup(content, 'lxml')
+        return self.create_text_fingerprint(soup.get_text())
         
-        # Create 5-gram shingles
-        shingles = set()
-        words = text.split()
+    def create_text_fingerprint(self, text):
+        """Create fingerprint of plain text using shingling
         
-        for i in range(len(words) - 4):
-            shingle = ' '.join(words[i:i+5])
-            shingle_hash = mmh3.hash(shingle)
-            shingles.add(shingle_hash)
+        The fingerprint is the sorted array of distinct shingle hashes.
+        """
+        # Create 5-gram shingles; split() already collapses whitespace runs
+        words = text.lower().split()
+        if len(words) < SHINGLE_SIZE:
+            return np.zeros(0, dtype=np.uint64)
             
-        return frozenset(shingles)
+        # Hash each word once, then combine every window of word hashes
+        # with a polynomial hash (wrapping modulo 2**64)
+        word_hashes = np.fromiter((mmh3.hash(word, signed=False) for word in words),
+                                  dtype=np.uint64, count=len(words))
+        windows = sliding_window_view(word_hashes, SHINGLE_SIZE)
+        shingle_hashes = (windows * _SHINGLE_POWERS).sum(axis=1, dtype=np.uint64)
+        
+        # Fold to 32 bits for the MinHash signature
+        shingle_hashes = (shingle_hashes ^ (shingle_hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+        return np.unique(shingle_hashes)
+        
+    def create_minhash(self, fingerprint):
+        """Create MinHash signature of a shingle fingerprint"""
+        minhash = MinHash(num_perm=self.num_perm, hashfunc=_identity_hash)
+        minhash.update_batch(fingerprint)
+        return minhash
         
     def calculate_similarity(self, fingerprint1, fingerprint2):
         """Calculate Jaccard similarity between fingerprints"""
-        if not fingerprint1 or not fingerprint2:
+        if not fingerprint1.size or not fingerprint2.size:
             return 0.0
             
-        intersection = len(fingerprint1.intersection(fingerprint2))
-        union = len(fingerprint1.union(fingerprint2))
+        # Both arrays are sorted and distinct, so the union size follows
+        # from the intersection without materializing it
+        intersection = np.intersect1d(fingerprint1, fingerprint2, assume_unique=True).size
+        union = fingerprint1.size + fingerprint2.size - intersection
         
         return intersection / union if union > 0 else 0.0
         
     def hash_string(self, text):
-        """Create hash of string"""
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+        """Create 8-byte hash of string for set membership checks"""
+        # Non-cryptographic: URL dedup needs no preimage resistance
+        return mmh3.hash64(text, signed=False)[0].to_bytes(8, 'little')
         
     def clear_cache(self):
         """Clear duplicate detection cache"""
         self.url_hashes.clear()
         self.content_hashes.clear()
+        self.content_lsh = MinHashLSH(threshold=self.similarity_threshold, num_perm=self.num_perm)
         self.redis_client.delete('seen_urls', 'content_fingerprints')
@@ -1,9 +1,55 @@
+import bisect
 import re
 from typing import List, Dict, Tuple
 from collections import defaultdict
 import string
 from indexer.text_processor import TextProcessor
 
+# Compiled once at import; queries are short, so per-call pattern lookups dominate
+_WORD_RE = re.compile(r'\w+')
+_BOOL_RE = re.compile(r'\b(?:and|or|not)\b')
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+_OP_RE = re.compile(r'\b(AND|OR|NOT)\b', re.IGNORECASE)
+_SITE_RE = re.compile(r'site:([^\s]+)', re.IGNORECASE)
+_FILETYPE_RE = re.compile(r'filetype:([^\s]+)', re.IGNORECASE)
+_DATE_RE = re.compile(r'\b(?:(?P<last_day>today|yesterday)|(?P<last_week>last week)'
+                      r'|(?P<last_month>last month)|(?P<last_year>last year))\b', re.IGNORECASE)
+
+# Simple implementation - in practice use advanced spelling correctors
+_CORRECTIONS = {
+    'teh': 'the',
+    'adn': 'and',
+    'recieve': 'receive',
+    'seperate': 'separate',
+    'definately': 'definitely'
+}
+_CORRECTIONS_RE = re.compile(r'\b(' + '|'.join(map(re.escape, _CORRECTIONS)) + r')\b', re.IGNORECASE)
+
+# Intent keywords, matched against the query's words
+_NAV_SINGLE = frozenset(['facebook', 'twitter', 'instagram', 'youtube', 'amazon', 'google',
+                         'login', 'homepage'])
+_NAV_PHRASES = (' sign in ', ' official site ')
+_TRANS_SINGLE = frozenset(['buy', 'purchase', 'order', 'price', 'cost', 'cheap', 'discount', 'deal',
+                           'download', 'install', 'get', 'free'])
+
+# Simple synonym expansion (in practice, use WordNet or custom synonym database)
+_SYNONYMS = {
+    'car': ['vehicle', 'automobile', 'auto'],
+    'house': ['home', 'residence', 'property'],
+    'job': ['work', 'employment', 'career'],
+    'phone': ['mobile', 'smartphone', 'cell']
+}
+
+# Simple prefix-based suggestions
+_COMMON_QUERIES = [
+    'python programming',
+    'machine learning',
+    'web development',
+    'data science',
+    'artificial intelligence',
+    'software engineering'
+]
+
 class QueryParser:
     def __init__(self):
         self.text_processor = TextProcessor()
@@ -13,11 +59,21 @@ class QueryParser:
             'NOT': '-'
         }
         
+        # Processed like query terms, so 'cars' (stemmed to 'car') finds its synonyms
+        self._synonyms = {}
+        for term, synonyms in _SYNONYMS.items():
+            processed = [self.text_processor.process_token(synonym) for synonym in synonyms]
+            self._synonyms[self.text_processor.process_token(term)] = [synonym for synonym in processed if synonym]
+            
+        # Sorted so prefix matches form a contiguous run found by bisection
+        self._suggestions = sorted(_COMMON_QUERIES)
+        
     def parse_query(self, raw_query):
         """Parse and process search query"""
-        # Detect query type and intent
-        query_type = self._detect_query_type(raw_query)
-        intent = self._detect_intent(raw_query)
+        # Detect query type and intent, lowercasing once for both
+        query_lower = raw_query.lower()
+        query_type = self._detect_query_type(raw_query, query_lower)
+        intent = self._detect_intent(raw_query, query_lower)
         
         # Handle quoted phrases
         phrases, remaining_query = self._extract_phrases(raw_query)
@@ -39,41 +95,41 @@ class QueryParser:
             'filters': self._extract_filters(raw_query)
         }
         
-    def _detect_query_type(self, query):
+    def _detect_query_type(self, query, query_lower=None):
         """Detect the type of query"""
-        query_lower = query.lower()
-        
-        if any(op in query_lower for op in ['and', 'or', 'not']):
+        if query_lower is None:
+            query_lower = query.lower()
+            
+        # Operators must be whole words, so 'sand' is not boolean
+        if _BOOL_RE.search(query_lower):
             return 'boolean'
         elif '"' in query:
             return 'phrase'
-        elif query.startswith('site:') or 'filetype:' in query:
+        elif query.startswith('site:') or 'filetype:' in query_lower:
             return 'filtered'
         elif query.endswith('?') or query.startswith(('what', 'how', 'when', 'where', 'why', 'who')):
             return 'question'
         else:
             return 'simple'
             
-    def _detect_intent(self, query):
+    def _detect_intent(self, query, query_lower=None):
         """Detect user intent from query"""
-        query_lower = query.lower()
+        if query_lower is None:
+            query_lower = query.lower()
         
-        # Navigational intent
-        navigational_patterns = [
-            r'\b(facebook|twitter|instagram|youtube|amazon|google)\b',
-            r'\b(login|sign in|homepage|official site)\b'
-        ]
+        # Split into words once; set intersection replaces keyword scans
+        words = _WORD_RE.findall(query_lower)
+        word_set = set(words)
         
-        if any(re.search(pattern, query_lower) for pattern in navigational_patterns):
+        # Navigational intent
+        if not _NAV_SINGLE.isdisjoint(word_set):
+            return 'navigational'
+        joined_words = ' ' + ' '.join(words) + ' '
+        if any(phrase in joined_words for phrase in _NAV_PHRASES):
             return 'navigational'
             
         # Transactional intent
-        transactional_patterns = [
-            r'\b(buy|purchase|order|price|cost|cheap|discount|deal)\b',
-            r'\b(download|install|get|free)\b'
-        ]
-        
-        if any(re.search(pattern, query_lower) for pattern in transactional_patterns):
+        if not _TRANS_SINGLE.isdisjoint(word_set):
             return 'transactional'
             
         # Informational intent (questions)
@@ -88,10 +144,7 @@ class QueryParser:
         remaining_query = query
         
         # Find quoted phrases
-        phrase_pattern = r'"([^"]*)"'
-        matches = re.finditer(phrase_pattern, query)
-        
-        for match in matches:
+        for match in _PHRASE_RE.finditer(query):
             phrase = match.group(1).strip()
             if phrase:
                 # Process phrase terms but keep them together
@@ -109,10 +162,7 @@ class QueryParser:
         remaining_query = query
         
         # Find operators (case insensitive)
-        operator_pattern = r'\b(AND|OR|NOT)\b'
-        matches = re.finditer(operator_pattern, query, re.IGNORECASE)
-        
-        for match in matches:
+        for match in _OP_RE.finditer(query):
             operator = match.group(1).upper()
             operators.append(operator)
             # Remove from remaining query
@@ -125,83 +175,50 @@ class QueryParser:
         filters = {}
         
         # Site filter (site:example.com)
-        site_match = re.search(r'site:([^\s]+)', query, re.IGNORECASE)
+        site_match = _SITE_RE.search(query)
         if site_match:
             filters['site'] = site_match.group(1)
             
         # Filetype filter (filetype:pdf)
-        filetype_match = re.search(r'filetype:([^\s]+)', query, re.IGNORECASE)
+        filetype_match = _FILETYPE_RE.search(query)
         if filetype_match:
             filters['filetype'] = filetype_match.group(1)
             
-        # Date filters
-        date_patterns = {
-            'last_day': r'\b(today|yesterday)\b',
-            'last_week': r'\blast week\b',
-            'last_month': r'\blast month\b',
-            'last_year': r'\blast year\b'
-        }
-        
-        for period, pattern in date_patterns.items():
-            if re.search(pattern, query, re.IGNORECASE):
-                filters['date'] = period
-                break
-                
+        # Date filters; the matching named group is the period
+        date_match = _DATE_RE.search(query)
+        if date_match:
+            filters['date'] = date_match.lastgroup
+            
         return filters
         
     def expand_query(self, processed_query):
         """Expand query with synonyms and related terms"""
-        expanded_terms = processed_query['processed_terms'].copy()
-        
-        # Simple synonym expansion (in practice, use WordNet or custom synonym database)
-        synonyms = {
-            'car': ['vehicle', 'automobile', 'auto'],
-            'house': ['home', 'residence', 'property'],
-            'job': ['work', 'employment', 'career'],
-            'phone': ['mobile', 'smartphone', 'cell']
-        }
+        processed_terms = processed_query['processed_terms']
         
-        for term in processed_query['processed_terms']:
-            if term in synonyms:
-                expanded_terms.extend(synonyms[term])
-                
-        return expanded_terms
+        # Ordered dedupe: the query's own terms first, then their synonyms
+        expanded_terms = dict.fromkeys(processed_terms)
+        for term in processed_terms:
+            expanded_terms.update(dict.fromkeys(self._synonyms.get(term, ())))
+            
+        return list(expanded_terms)
         
     def correct_spelling(self, query):
         """Basic spelling correction"""
-        # Simple implementation - in practice use advanced spelling correctors
-        common_corrections = {
-            'teh': 'the',
-            'adn': 'and',
-            'recieve': 'receive',
-            'seperate': 'separate',
-            'definately': 'definitely'
-        }
-        
-        corrected_query = query
-        for mistake, correction in common_corrections.items():
-            corrected_query = re.sub(r'\b' + mistake + r'\b', correction, corrected_query, flags=re.IGNORECASE)
-            
-        return corrected_query
+        # One pass over the query for all known mistakes
+        return _CORRECTIONS_RE.sub(lambda match: _CORRECTIONS[match.group(1).lower()], query)
         
     def get_query_suggestions(self, partial_query):
         """Generate query suggestions based on partial input"""
         # This would typically use query logs and popularity data
         suggestions = []
         
-        # Simple prefix-based suggestions
-        common_queries = [
-            'python programming',
-            'machine learning',
-            'web development',
-            'data science',
-            'artificial intelligence',
-            'software engineering'
-        ]
-        
+        # Jump to the first candidate, then walk forward while the prefix matches
         partial_lower = partial_query.lower()
-        for query in common_queries:
-            if query.startswith(partial_lower):
-                suggestions.append(query)
-                
-        return suggestions[:5]  # Return top 5 suggestions
+        i = bisect.bisect_left(self._suggestions, partial_lower)
+        while i < len(self._suggestions) and self._suggestions[i].startswith(partial_lower):
+            suggestions.append(self._suggestions[i])
+            if len(suggestions) == 5:  # Return top 5 suggestions
+                break
+            i += 1
+            
+        return suggestions
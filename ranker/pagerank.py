@@ -1,30 +1,84 @@
 import numpy as np
-from collections import defaultdict
-import pickle
+from numba import float32, float64, int32, njit, prange, void
+from scipy.sparse import csc_matrix
+from collections.abc import Mapping
 import logging
+import os
+import orjson
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+class _ScoreView(Mapping):
+    """Read-only url -> score mapping over an array of scores indexed by page id"""
+    def __init__(self, url_to_id, array):
+        self.url_to_id = url_to_id
+        self.array = array
+        
+    def __getitem__(self, url):
+        node_id = self.url_to_id[url]
+        if node_id >= len(self.array):
+            raise KeyError(url)  # Page added after the scores were calculated
+        return float(self.array[node_id])
+        
+    def __iter__(self):
+        scored = len(self.array)
+        return (url for url, node_id in self.url_to_id.items() if node_id < scored)
+        
+    def __len__(self):
+        return min(len(self.array), len(self.url_to_id))
+
+@njit(void(int32[:], int32[:], float32[:], float32[:], int32[:], float64, float32[:], float32[:]),
+      parallel=True, fastmath=True, cache=True)
+def _pr_iterate(indptr, indices, data, scores, dangling_ids, d, teleport, out):
+    """One power iteration over the CSR rows (incoming links) of the transition matrix
+    
+    out[i] = d * (sum of incoming score + dangling score / n) + teleport[i]
+    
+    Arrays are float32 to halve the memory traffic; sums are taken in float64.
+    """
+    n = out.shape[0]
+    dangling_sum = 0.0
+    for k in range(dangling_ids.shape[0]):
+        dangling_sum += scores[dangling_ids[k]]
+    dangling_share = dangling_sum / n
+    for i in prange(n):
+        s = 0.0
+        for k in range(indptr[i], indptr[i + 1]):
+            s += data[k] * scores[indices[k]]
+        out[i] = d * (s + dangling_share) + teleport[i]
+
 class PageRank:
     def __init__(self, damping_factor=0.85, max_iterations=50, tolerance=1e-6):
         self.damping_factor = damping_factor
         self.max_iterations = max_iterations
         self.tolerance = tolerance
-        self.graph = defaultdict(set)  # outgoing links
-        self.reverse_graph = defaultdict(set)  # incoming links
-        self.scores = {}
+        self._edges_src = []  # source id of every added link
+        self._edges_dst = []  # target id of every added link
+        self._adjacency = None  # (indptr, indices) CSR of distinct outgoing links, built lazily
         self.url_to_id = {}
+        self.scores = _ScoreView(self.url_to_id, np.zeros(0, dtype=np.float32))
         self.id_to_url = {}
         self.next_id = 0
+        self._transition_version = 0  # bumped whenever the graph changes
+        self._transition_cache = None  # (matrix, dangling_ids) built for _transition_cache_version
+        self._transition_cache_version = -1
         
     def add_link(self, source_url, target_url):
         """Add a link to the graph"""
+        if self._edges_src is None:
+            # A loaded graph only has its CSR arrays; expand them to extend it
+            indptr, indices = self._adjacency
+            self._edges_src = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)).tolist()
+            self._edges_dst = np.asarray(indices).tolist()
+            
         source_id = self._get_or_create_id(source_url)
         target_id = self._get_or_create_id(target_url)
         
-        self.graph[source_id].add(target_id)
-        self.reverse_graph[target_id].add(source_id)
+        self._edges_src.append(source_id)
+        self._edges_dst.append(target_id)
+        self._adjacency = None
+        self._transition_version += 1
         
     def _get_or_create_id(self, url):
         """Get or create numeric ID for URL"""
@@ -34,70 +88,110 @@ class PageRank:
             self.next_id += 1
         return self.url_to_id[url]
         
+    def _get_adjacency(self):
+        """Get (indptr, indices), the outgoing links of each page as int32 CSR arrays
+        
+        Repeated links are dropped and each page's targets are sorted.
+        """
+        if self._adjacency is None:
+            n = len(self.url_to_id)
+            src = np.asarray(self._edges_src, dtype=np.int64)
+            dst = np.asarray(self._edges_dst, dtype=np.int64)
+            
+            # Sorting the combined (src, dst) keys groups links by source
+            edges = np.unique(src * n + dst)
+            src = edges // n
+            indptr = np.searchsorted(src, np.arange(n + 1)).astype(np.int32)
+            indices = (edges % n).astype(np.int32)
+            self._adjacency = (indptr, indices)
+        return self._adjacency
+        
     def calculate_pagerank(self):
         """Calculate PageRank scores using power iteration method"""
-        if not self.graph:
+        if not self.url_to_id:
             logger.warning("Empty graph, cannot calculate PageRank")
             return
             
         n = len(self.url_to_id)
         logger.info(f"Calculating PageRank for {n} pages")
         
-        # Initialize scores uniformly
-        scores = np.ones(n) / n
+        # Initialize scores uniformly; iterations alternate between two buffers
+        scores = np.full(n, 1.0 / n, dtype=np.float32)
+        new_scores = np.empty(n, dtype=np.float32)
+        diff = np.empty(n, dtype=np.float32)
         
         # Create transition matrix
-        transition_matrix = self._build_transition_matrix(n)
+        transition_matrix, dangling_ids = self._build_transition_matrix(n)
+        
+        # Random jump probability
+        teleport = np.full(n, (1 - self.damping_factor) / n, dtype=np.float32)
         
         # Power iteration
         for iteration in range(self.max_iterations):
-            new_scores = self._pagerank_iteration(scores, transition_matrix, n)
+            self._pagerank_iteration(scores, transition_matrix, dangling_ids,
+                                     self.damping_factor, teleport, out=new_scores)
             
             # Check convergence
-            diff = np.linalg.norm(new_scores - scores, 1)
-            if diff < self.tolerance:
+            if self._l1_distance(new_scores, scores, diff) < self.tolerance:
                 logger.info(f"PageRank converged after {iteration + 1} iterations")
                 break
                 
-            scores = new_scores
+            scores, new_scores = new_scores, scores
             
-        # Store final scores
-        for node_id, score in enumerate(scores):
-            if node_id < len(self.id_to_url):
-                url = self.id_to_url[node_id]
-                self.scores[url] = score
-                
-        logger.info(f"PageRank calculation completed. Top score: {max(self.scores.values()):.6f}")
+        # Store final scores, looked up by URL through the page ids
+        self.scores = _ScoreView(self.url_to_id, scores)
+        
+        logger.info(f"PageRank calculation completed. Top score: {scores.max():.6f}")
         
     def _build_transition_matrix(self, n):
-        """Build the transition matrix for PageRank"""
-        matrix = np.zeros((n, n))
-        
-        for source_id in range(n):
-            outgoing_links = self.graph.get(source_id, set())
-            
-            if outgoing_links:
-                # Distribute probability equally among outgoing links
-                prob = 1.0 / len(outgoing_links)
-                for target_id in outgoing_links:
-                    if target_id < n:
-                        matrix[target_id][source_id] = prob
-            else:
-                # Dead-end handling: distribute probability to all pages
-                matrix[:, source_id] = 1.0 / n
-                
-        return matrix
+        """Build the sparse transition matrix for PageRank
+        
+        Returns (matrix, dangling_ids), the matrix in CSR form with int32
+        indices for the iteration kernel. Dead ends get empty columns and
+        are listed in dangling_ids; iterations spread their score over all
+        pages instead of storing dense 1/n columns.
+        
+        The result is cached until the graph changes, so personalized
+        rankings reuse the matrix of the last PageRank run.
+        """
+        if self._transition_cache_version == self._transition_version:
+            return self._transition_cache
+            
+        # Outgoing links in CSR form are exactly the columns of M in CSC form
+        indptr, indices = self._get_adjacency()
+        out_degree = np.diff(indptr)
+        dangling_ids = np.flatnonzero(out_degree == 0).astype(np.int32)
         
-    def _pagerank_iteration(self, scores, transition_matrix, n):
-        """Single iteration of PageRank calculation"""
-        # Apply damping factor
-        damped_scores = self.damping_factor * np.dot(transition_matrix, scores)
+        # Distribute probability equally among outgoing links
+        probs = np.repeat(1.0 / np.maximum(out_degree, 1), out_degree).astype(np.float32)
+        matrix = csc_matrix((probs, indices, indptr), shape=(n, n))
         
-        # Add random jump probability
-        random_jump = (1 - self.damping_factor) / n
-        new_scores = damped_scores + random_jump
+        # The kernel walks rows, i.e. each page's incoming links
+        matrix = matrix.tocsr()
+        matrix.indptr = matrix.indptr.astype(np.int32, copy=False)
+        matrix.indices = matrix.indices.astype(np.int32, copy=False)
         
-        return new_scores
+        self._transition_cache = (matrix, dangling_ids)
+        self._transition_cache_version = self._transition_version
+        return self._transition_cache
+        
+    def _pagerank_iteration(self, scores, transition_matrix, dangling_ids, damping_factor, teleport,
+                            out=None):
+        """Single iteration of PageRank calculation, written to out if given"""
+        if out is None:
+            out = np.empty_like(scores)
+            
+        # Dead ends spread their score over all pages; the kernel sums and adds it
+        _pr_iterate(transition_matrix.indptr, transition_matrix.indices, transition_matrix.data,
+                    scores, dangling_ids, damping_factor, teleport, out)
+        return out
+        
+    @staticmethod
+    def _l1_distance(a, b, buffer):
+        """L1 distance between score vectors, using buffer instead of temporaries"""
+        np.subtract(a, b, out=buffer)
+        np.abs(buffer, out=buffer)
+        return buffer.sum(dtype=np.float64)
         
     def get_score(self, url):
         """Get PageRank score for a URL"""
@@ -105,32 +199,61 @@ class PageRank:
         
     def get_top_pages(self, n=10):
         """Get top N pages by PageRank score"""
-        sorted_pages = sorted(self.scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_pages[:n]
+        scores = self.scores.array
+        top_ids = np.argsort(-scores, kind='stable')[:n]
+        return [(self.id_to_url[node_id], float(scores[node_id])) for node_id in top_ids.tolist()]
         
     def save_scores(self, filepath):
-        """Save PageRank scores to file"""
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'scores': self.scores,
-                'url_to_id': self.url_to_id,
-                'id_to_url': self.id_to_url,
-                'graph': dict(self.graph),
-                'reverse_graph': dict(self.reverse_graph)
-            }, f)
+        """Save PageRank scores to files sharing the filepath prefix
+        
+        Scores and the link graph are raw .npy arrays indexed by page id,
+        and the URLs a JSON list in id order.
+        """
+        indptr, indices = self._get_adjacency()
+        arrays = {
+            '.scores.npy': np.asarray(self.scores.array, dtype=np.float32),
+            '.indptr.npy': indptr,
+            '.indices.npy': indices
+        }
+        
+        # Write next to the old files and swap them in, since loaded
+        # scores may still be memory-mapped from them
+        for suffix, array in arrays.items():
+            with open(filepath + suffix + '.tmp', 'wb') as f:
+                np.save(f, array)
+        with open(filepath + '.urls.json.tmp', 'wb') as f:
+            f.write(orjson.dumps([self.id_to_url[node_id] for node_id in range(self.next_id)]))
+            
+        for suffix in (*arrays, '.urls.json'):
+            os.replace(filepath + suffix + '.tmp', filepath + suffix)
             
     def load_scores(self, filepath):
-        """Load PageRank scores from file"""
+        """Load PageRank scores from files written by save_scores
+        
+        Arrays are memory-mapped, so scores page in as they are looked up.
+        """
         try:
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
-                self.scores = data['scores']
-                self.url_to_id = data['url_to_id']
-                self.id_to_url = data['id_to_url']
-                self.graph = defaultdict(set, data['graph'])
-                self.reverse_graph = defaultdict(set, data['reverse_graph'])
-                self.next_id = len(self.url_to_id)
-                logger.info(f"Loaded PageRank scores for {len(self.scores)} pages")
+            # Read every file before replacing any state, so a missing or
+            # corrupt one leaves the current graph intact
+            with open(filepath + '.urls.json', 'rb') as f:
+                urls = orjson.loads(f.read())
+            scores = np.load(filepath + '.scores.npy', mmap_mode='r')
+            indptr = np.load(filepath + '.indptr.npy', mmap_mode='r')
+            indices = np.load(filepath + '.indices.npy', mmap_mode='r')
+            if len(indptr) != len(urls) + 1 or len(scores) > len(urls):
+                raise ValueError("score and graph files do not match the URL list")
+                
+            self.id_to_url = dict(enumerate(urls))
+            self.url_to_id = {url: node_id for node_id, url in enumerate(urls)}
+            self.next_id = len(urls)
+            self.scores = _ScoreView(self.url_to_id, scores)
+            
+            # Edge lists are only rebuilt if links are added
+            self._adjacency = (indptr, indices)
+            self._edges_src = None
+            self._edges_dst = None
+            self._transition_version += 1
+            logger.info(f"Loaded PageRank scores for {len(self.scores)} pages")
         except FileNotFoundError:
             logger.warning(f"PageRank file not found: {filepath}")
         except Exception as e:
@@ -139,18 +262,17 @@ class PageRank:
     def get_graph_stats(self):
         """Get statistics about the link graph"""
         total_nodes = len(self.url_to_id)
-        total_edges = sum(len(links) for links in self.graph.values())
+        indptr, indices = self._get_adjacency()
+        total_edges = len(indices)
         
         # Calculate average degree
         avg_out_degree = total_edges / total_nodes if total_nodes > 0 else 0
         
         # Find nodes with no outgoing links (dead ends)
-        dead_ends = sum(1 for node_id in range(total_nodes) 
-                       if len(self.graph.get(node_id, set())) == 0)
+        dead_ends = int(np.count_nonzero(np.diff(indptr) == 0))
         
         # Find nodes with no incoming links
-        no_incoming = sum(1 for node_id in range(total_nodes)
-                         if len(self.reverse_graph.get(node_id, set())) == 0)
+        no_incoming = int(np.count_nonzero(np.bincount(indices, minlength=total_nodes) == 0))
         
         return {
             'total_nodes': total_nodes,
@@ -169,7 +291,7 @@ class PageRank:
         n = len(self.url_to_id)
         
         # Create personalization vector
-        personalization = np.zeros(n)
+        personalization = np.zeros(n, dtype=np.float32)
         seed_ids = []
         
         for url in seed_urls:
@@ -184,27 +306,30 @@ class PageRank:
         for seed_id in seed_ids:
             personalization[seed_id] = 1.0 / len(seed_ids)
             
-        # Initialize scores
+        # Initialize scores; iterations alternate between two buffers
         scores = personalization.copy()
-        transition_matrix = self._build_transition_matrix(n)
+        new_scores = np.empty(n, dtype=np.float32)
+        diff = np.empty(n, dtype=np.float32)
+        transition_matrix, dangling_ids = self._build_transition_matrix(n)
+        
+        teleport = alpha * personalization
         
         # Power iteration with personalization
         for iteration in range(self.max_iterations):
-            new_scores = ((1 - alpha) * np.dot(transition_matrix, scores) + 
-                         alpha * personalization)
+            self._pagerank_iteration(scores, transition_matrix, dangling_ids,
+                                     1 - alpha, teleport, out=new_scores)
             
             # Check convergence
-            diff = np.linalg.norm(new_scores - scores, 1)
-            if diff < self.tolerance:
+            if self._l1_distance(new_scores, scores, diff) < self.tolerance:
                 break
                 
-            scores = new_scores
+            scores, new_scores = new_scores, scores
             
         # Convert to dictionary
         personalized_scores = {}
         for node_id, score in enumerate(scores):
             if node_id < len(self.id_to_url):
                 url = self.id_to_url[node_id]
-                personalized_scores[url] = score
+                personalized_scores[url] = float(score)
                 
         return personalized_scores
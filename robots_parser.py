@@ -1,6 +1,7 @@
 import urllib.robotparser
 from urllib.parse import urljoin, urlparse
 import asyncio
+import time
 import aiohttp
 from config.settings import Config
 import logging
@@ -9,8 +10,9 @@ logger = logging.getLogger(__name__)
 
 class RobotsParser:
     def __init__(self):
-        self.robots_cache = {}
+        self.robots_cache = {}  # robots_url -> (parser or None, fetch time)
         self.cache_expiry = 3600  # 1 hour cache
+        self._session = None  # shared by all fetches, created on first use
         
     async def can_fetch(self, url, user_agent=None):
         """Check if URL can be fetched according to robots.txt"""
@@ -21,11 +23,12 @@ class RobotsParser:
         robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
         
         # Check cache first
-        if robots_url in self.robots_cache:
-            rp = self.robots_cache[robots_url]
+        cached = self.robots_cache.get(robots_url)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_expiry:
+            rp = cached[0]
         else:
             rp = await self._fetch_robots_txt(robots_url)
-            self.robots_cache[robots_url] = rp
+            self.robots_cache[robots_url] = (rp, time.monotonic())
             
         if rp is None:
             # If robots.txt not found, allow crawling
@@ -35,18 +38,22 @@ class RobotsParser:
         
     async def _fetch_robots_txt(self, robots_url):
         """Fetch and parse robots.txt"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+            
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(robots_url, timeout=10) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        rp = urllib.robotparser.RobotFileParser()
-                        rp.set_url(robots_url)
-                        rp.read()
-                        return rp
-                    else:
-                        logger.info(f"robots.txt not found: {robots_url}")
-                        return None
+            async with self._session.get(robots_url, timeout=10) as response:
+                if response.status == 200:
+                    content = await response.text()
+                    
+                    # Parse what was fetched instead of reading it again
+                    rp = urllib.robotparser.RobotFileParser()
+                    rp.set_url(robots_url)
+                    rp.parse(content.splitlines())
+                    return rp
+                else:
+                    logger.info(f"robots.txt not found: {robots_url}")
+                    return None
         except Exception as e:
             logger.error(f"Error fetching robots.txt from {robots_url}: {e}")
             return None
@@ -60,9 +67,15 @@ class RobotsParser:
         robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
         
         if robots_url in self.robots_cache:
-            rp = self.robots_cache[robots_url]
+            rp = self.robots_cache[robots_url][0]
             if rp:
                 delay = rp.crawl_delay(user_agent)
                 return delay if delay else Config.CRAWL_DELAY
                 
         return Config.CRAWL_DELAY
+        
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
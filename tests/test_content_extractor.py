@@ -0,0 +1,42 @@
+import unittest
+
+from config.crawler.content_extractor import ContentExtractor, parse_html
+
+
+class ParseHtmlEncodingTest(unittest.TestCase):
+    PAGE = '<html><body><p>café</p></body></html>'
+    
+    def test_malformed_charsets_are_normalized(self):
+        for charset in ('"utf-8"', 'utf-8;', ' UTF-8 ', "'utf-8'"):
+            with self.subTest(charset=charset):
+                tree = parse_html(self.PAGE.encode('utf-8'), charset)
+                self.assertEqual(tree.text_content(), 'café')
+                
+    def test_unknown_charsets_fall_back_to_detection(self):
+        for charset in ('none', 'x-user-defined', 'no-such-codec'):
+            with self.subTest(charset=charset):
+                tree = parse_html(self.PAGE.encode('utf-8'), charset)
+                self.assertEqual(tree.text_content(), 'café')
+                
+    def test_codec_unknown_to_libxml2_still_parses(self):
+        tree = parse_html(b'<p>x</p>', 'mac-roman')
+        self.assertEqual(tree.text_content(), 'x')
+        
+    def test_empty_document(self):
+        self.assertEqual(parse_html(b'', 'utf-8').text_content(), '')
+        self.assertEqual(parse_html('').text_content(), '')
+        
+    def test_str_with_xml_declaration(self):
+        page = '<?xml version="1.0" encoding="iso-8859-1"?>' + self.PAGE
+        self.assertEqual(parse_html(page).text_content(), 'café')
+        
+        extracted = ContentExtractor().extract(page, 'http://example.com/')
+        self.assertEqual(extracted['body_text'], 'café')
+        
+    def test_str_ignores_declared_charset(self):
+        page = '<html><head><meta charset="iso-8859-1"></head><body><p>café</p></body></html>'
+        self.assertEqual(parse_html(page, 'koi8-r').text_content(), 'café')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+from config.crawler.crawler import URLFrontier
+from config.settings import Config
+
+
+class FakeRedis:
+    """In-memory stand-in for the set commands the frontier uses"""
+    def __init__(self):
+        self.sets = {}
+        
+    def sadd(self, key, *values):
+        self.sets.setdefault(key, set()).update(values)
+        
+    def srem(self, key, *values):
+        self.sets.setdefault(key, set()).difference_update(values)
+
+
+class URLFrontierTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'CRAWL_DELAY', 60.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.frontier = URLFrontier()
+        self.frontier.redis_client = FakeRedis()
+        
+    def test_one_url_per_domain_within_crawl_delay(self):
+        self.frontier.add_urls(['http://a.com/1', 'http://a.com/2', 'http://b.com/1'])
+        
+        self.assertEqual(self.frontier.get_next_urls(10), ['http://a.com/1', 'http://b.com/1'])
+        self.assertEqual(self.frontier.get_next_urls(10), [])
+        self.assertEqual(self.frontier.size(), 1)
+        self.assertGreater(self.frontier.time_until_ready(), 0)
+        
+    def test_domain_ready_after_crawl_delay(self):
+        self.frontier.add_urls(['http://a.com/1', 'http://a.com/2'])
+        self.assertEqual(self.frontier.get_next_urls(10), ['http://a.com/1'])
+        
+        # Pretend the domain was last fetched a full delay ago
+        self.frontier.ready_heap = [(0.0, 'a.com')]
+        self.assertEqual(self.frontier.time_until_ready(), 0.0)
+        self.assertEqual(self.frontier.get_next_urls(10), ['http://a.com/2'])
+        self.assertTrue(self.frontier.is_empty())
+        
+    def test_priority_order_within_domain(self):
+        self.frontier.add_url('http://a.com/low', priority=2)
+        self.frontier.add_url('http://a.com/high', priority=1)
+        self.assertEqual(self.frontier.get_next_url(), 'http://a.com/high')
+        
+    def test_crawled_urls_are_skipped_without_using_the_delay(self):
+        self.frontier.add_urls(['http://a.com/1', 'http://a.com/2'])
+        self.frontier.crawled_urls.add('http://a.com/1')
+        
+        self.assertEqual(self.frontier.get_next_urls(10), ['http://a.com/2'])
+        self.assertTrue(self.frontier.is_empty())
+        self.assertIsNone(self.frontier.time_until_ready())
+        
+    def test_crawled_urls_are_not_queued_again(self):
+        self.assertTrue(self.frontier.add_url('http://a.com/1'))
+        self.assertEqual(self.frontier.get_next_url(), 'http://a.com/1')
+        self.assertFalse(self.frontier.add_url('http://a.com/1'))
+        
+    def test_redis_mirrors_queued_urls(self):
+        self.frontier.add_urls(['http://a.com/1', 'http://b.com/1'])
+        self.frontier.get_next_urls(1)
+        self.assertEqual(self.frontier.redis_client.sets['frontier_urls'], {'http://b.com/1'})
+
+
+if __name__ == '__main__':
+    unittest.main()
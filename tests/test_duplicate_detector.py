@@ -0,0 +1,70 @@
+import unittest
+
+from duplicate_detector import DuplicateDetector
+
+
+class FakeRedis:
+    """In-memory stand-in for the set commands the detector uses"""
+    def __init__(self):
+        self.sets = {}
+        self.round_trips = 0
+        
+    def _set(self, key):
+        return self.sets.setdefault(key, set())
+        
+    def sadd(self, key, *values):
+        self.round_trips += 1
+        before = len(self._set(key))
+        self._set(key).update(values)
+        return len(self._set(key)) - before
+        
+    def smismember(self, key, values):
+        self.round_trips += 1
+        return [int(value in self._set(key)) for value in values]
+        
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+        
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+        
+    def execute(self):
+        results = [getattr(self.redis_client, name)(*args) for name, args in self.commands]
+        self.redis_client.round_trips -= len(self.commands) - 1
+        return results
+
+
+class URLDedupTest(unittest.TestCase):
+    def setUp(self):
+        self.detector = DuplicateDetector()
+        self.detector.redis_client = FakeRedis()
+        
+    def test_is_duplicate_url(self):
+        self.assertFalse(self.detector.is_duplicate_url('http://a.com/x?utm_source=feed'))
+        self.assertTrue(self.detector.is_duplicate_url('http://a.com/x/'))
+        
+        # Seen by another crawler sharing Redis
+        self.detector.url_hashes.clear()
+        self.assertTrue(self.detector.is_duplicate_url('http://a.com/x'))
+        
+    def test_filter_duplicate_urls_in_one_round_trip(self):
+        self.detector.is_duplicate_url('http://a.com/seen')
+        self.detector.url_hashes.clear()
+        redis_client = self.detector.redis_client
+        redis_client.round_trips = 0
+        
+        new_urls = self.detector.filter_duplicate_urls(
+            ['http://a.com/seen', 'http://a.com/new', 'http://a.com/new/', 'http://b.com/'])
+        self.assertEqual(new_urls, ['http://a.com/new', 'http://b.com/'])
+        self.assertEqual(redis_client.round_trips, 1)
+        self.assertEqual(self.detector.filter_duplicate_urls(['http://b.com']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import tempfile
+import unittest
+
+from config.crawler.inverted_index import InvertedIndex
+
+
+def build_index(doc_ids, seed=0):
+    """Index random documents under the given ids, returning (index, documents)"""
+    rng = random.Random(seed)
+    vocab = ['term%d' % i for i in range(200)]
+    documents = {}
+    index = InvertedIndex()
+    for doc_id in doc_ids:
+        # Skewed vocabulary so posting lists range from one block to many
+        tokens = [rng.choice(vocab[:rng.randint(2, len(vocab))]) for _ in range(rng.randint(0, 50))]
+        documents[doc_id] = tokens
+        index.add_document(doc_id, tokens)
+    return index, documents
+
+
+class SaveLoadTest(unittest.TestCase):
+    def assert_round_trip(self, doc_ids):
+        index, documents = build_index(doc_ids)
+        terms = sorted({token for tokens in documents.values() for token in tokens})
+        
+        with tempfile.TemporaryDirectory() as directory:
+            index.save_to_file(directory)
+            loaded = InvertedIndex()
+            loaded.load_from_file(directory)
+            
+            self.assertEqual(loaded.get_stats(), index.get_stats())
+            self.assertEqual(loaded.search(terms), index.search(terms))
+            for doc_id in doc_ids:
+                self.assertEqual(loaded.get_document_length(doc_id), index.get_document_length(doc_id))
+                
+    def test_round_trip_str_doc_ids(self):
+        self.assert_round_trip(['doc%d' % i for i in range(600)])
+        
+    def test_round_trip_int_doc_ids(self):
+        self.assert_round_trip(list(range(600)))
+        
+    def test_add_documents_after_load(self):
+        index, documents = build_index(['doc%d' % i for i in range(400)])
+        more_index, more_documents = build_index(['doc%d' % i for i in range(400, 600)], seed=1)
+        terms = sorted({token for tokens in (*documents.values(), *more_documents.values())
+                        for token in tokens})
+        
+        with tempfile.TemporaryDirectory() as directory:
+            index.save_to_file(directory)
+            loaded = InvertedIndex()
+            loaded.load_from_file(directory)
+            for doc_id, tokens in more_documents.items():
+                index.add_document(doc_id, tokens)
+                loaded.add_document(doc_id, tokens)
+            self.assertEqual(loaded.search(terms), index.search(terms))
+            
+            # Saving over the files the loaded index is still mapping
+            loaded.save_to_file(directory)
+            reloaded = InvertedIndex()
+            reloaded.load_from_file(directory)
+            self.assertEqual(reloaded.get_stats(), index.get_stats())
+            self.assertEqual(reloaded.search(terms), index.search(terms))
+
+
+if __name__ == '__main__':
+    unittest.main()
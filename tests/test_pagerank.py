@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from ranker.pagerank import PageRank
+
+
+def dense_pagerank(links, n, damping_factor, tolerance, max_iterations):
+    """Reference power iteration on the dense transition matrix"""
+    matrix = np.zeros((n, n))
+    for source in range(n):
+        targets = sorted({target for s, target in links if s == source})
+        if targets:
+            matrix[targets, source] = 1.0 / len(targets)
+        else:
+            matrix[:, source] = 1.0 / n
+    scores = np.ones(n) / n
+    for _ in range(max_iterations):
+        new_scores = damping_factor * matrix @ scores + (1 - damping_factor) / n
+        if np.abs(new_scores - scores).sum() < tolerance:
+            break
+        scores = new_scores
+    return scores
+
+
+class PageRankTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.links = [('u%d' % rng.randrange(120), 'u%d' % rng.randrange(120)) for _ in range(600)]
+        self.links.append(('u0', 'dead-end'))  # a page with no outgoing links
+        self.pagerank = PageRank()
+        for source, target in self.links:
+            self.pagerank.add_link(source, target)
+        self.n = len(self.pagerank.url_to_id)
+        
+    def test_matches_dense_power_iteration(self):
+        self.pagerank.calculate_pagerank()
+        
+        ids = self.pagerank.url_to_id
+        links = [(ids[source], ids[target]) for source, target in self.links]
+        expected = dense_pagerank(links, self.n, self.pagerank.damping_factor,
+                                  self.pagerank.tolerance, self.pagerank.max_iterations)
+        
+        for url, node_id in ids.items():
+            self.assertAlmostEqual(self.pagerank.get_score(url), expected[node_id], delta=1e-6)
+            
+    def test_save_and_load(self):
+        self.pagerank.calculate_pagerank()
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'pagerank')
+            self.pagerank.save_scores(prefix)
+            loaded = PageRank()
+            loaded.load_scores(prefix)
+            
+            self.assertEqual(dict(loaded.scores), dict(self.pagerank.scores))
+            self.assertEqual(loaded.get_graph_stats(), self.pagerank.get_graph_stats())
+            
+            # A loaded graph can still be extended and ranked again
+            loaded.add_link('dead-end', 'u0')
+            loaded.calculate_pagerank()
+            self.assertEqual(len(loaded.scores), self.n)
+            
+    def test_failed_load_keeps_current_state(self):
+        self.pagerank.calculate_pagerank()
+        other = PageRank()
+        other.add_link('x', 'y')
+        other.calculate_pagerank()
+        before = (dict(self.pagerank.scores), self.pagerank.get_graph_stats(), self.pagerank.get_top_pages())
+        
+        with tempfile.TemporaryDirectory() as directory:
+            prefix = os.path.join(directory, 'pagerank')
+            other.save_scores(prefix)
+            os.remove(prefix + '.indices.npy')
+            self.pagerank.load_scores(prefix)
+            
+        self.assertEqual((dict(self.pagerank.scores), self.pagerank.get_graph_stats(),
+                          self.pagerank.get_top_pages()), before)
+        
+    def test_personalized_pagerank_sums_to_one(self):
+        scores = self.pagerank.personalized_pagerank(['u1', 'u2'])
+        self.assertEqual(len(scores), self.n)
+        self.assertAlmostEqual(sum(scores.values()), 1.0, delta=1e-4)
+        self.assertEqual(self.pagerank.personalized_pagerank(['unknown']), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+import nltk
+from bs4 import BeautifulSoup
+
+from text_processor import TextProcessor
+
+
+def _has_stopwords():
+    try:
+        nltk.data.find('corpora/stopwords')
+        return True
+    except LookupError:
+        return False
+
+
+class TokenizeTest(unittest.TestCase):
+    def setUp(self):
+        # tokenize and clean_text use no per-language state, so skip
+        # loading the stop word corpus
+        self.processor = TextProcessor.__new__(TextProcessor)
+        
+    def tokenize(self, text):
+        return self.processor.tokenize(self.processor.clean_text(text))
+        
+    def test_apostrophes_and_hyphens_join_words(self):
+        # Unlike NLTK's word_tokenize, which split "don't" into "do" and "n't"
+        self.assertEqual(self.tokenize("e-mail don't rock'n'roll"), ['email', 'dont', 'rocknroll'])
+        
+    def test_other_punctuation_separates_words(self):
+        self.assertEqual(self.tokenize('hello,world end.start a/b x_y (c)d'),
+                         ['hello', 'world', 'end', 'start', 'a', 'b', 'x', 'y', 'c', 'd'])
+        
+    def test_surrounding_punctuation_is_removed(self):
+        self.assertEqual(self.tokenize('(Hello), world! "quoted"...'), ['hello', 'world', 'quoted'])
+        
+    def test_digit_leading_tokens_are_kept(self):
+        self.assertEqual(self.tokenize('3d 100mg 2024 mp3'), ['3d', '100mg', '2024', 'mp3'])
+        
+    def test_non_ascii_words_are_kept(self):
+        self.assertEqual(self.tokenize('Café naïve'), ['café', 'naïve'])
+        
+    def test_urls_and_emails_are_removed(self):
+        self.assertEqual(self.tokenize('see https://example.com/a-b or mail me@example.org now'),
+                         ['see', 'or', 'mail', 'now'])
+
+
+class FeatureTextsTest(unittest.TestCase):
+    PAGE = ('<html><head><title>Title</title></head><body>'
+            '<footer><meta name="description" content="footer"><a>Footer link</a></footer>'
+            '<meta name="description" content="real"><meta name="keywords" content="words">'
+            '<h1>Heading</h1><a>Link</a><script>code()</script>Body</body></html>')
+    
+    def setUp(self):
+        self.processor = TextProcessor.__new__(TextProcessor)
+        
+    def test_matches_individual_extractors(self):
+        soup = BeautifulSoup(self.PAGE, 'lxml')
+        expected = {
+            'title': self.processor.extract_title_text(soup),
+            'headings': self.processor.extract_heading_text(soup),
+            'body': self.processor.extract_body_text(soup),
+            'links': self.processor.extract_link_text(soup),
+            'meta': self.processor.extract_meta_text(soup)
+        }
+        self.assertEqual(self.processor.extract_feature_texts(BeautifulSoup(self.PAGE, 'lxml')), expected)
+        
+    def test_meta_tags_in_removed_elements_are_ignored(self):
+        features = self.processor.extract_feature_texts(BeautifulSoup(self.PAGE, 'lxml'))
+        self.assertEqual(features['meta'], 'real words')
+        self.assertEqual(features['links'], 'Link')
+
+
+@unittest.skipUnless(_has_stopwords(), 'NLTK stopwords corpus not installed')
+class ProcessTextTest(unittest.TestCase):
+    def setUp(self):
+        self.processor = TextProcessor()
+        
+    def test_numbers_short_tokens_and_stop_words_are_dropped(self):
+        self.assertEqual(self.processor.process_text('The 2024 e-mail is a 3d x'), ['email', '3d'])
+        
+    def test_tokens_are_stemmed(self):
+        self.assertEqual(self.processor.process_text('running cars'), ['run', 'car'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import math
+import random
+import sys
+import types
+import unittest
+
+from config.crawler import inverted_index
+from tests.test_inverted_index import build_index
+
+# tf_idf imports the index from the package it is deployed under
+sys.modules.setdefault('indexer', types.ModuleType('indexer'))
+sys.modules.setdefault('indexer.inverted_index', inverted_index)
+
+from config.crawler.ranker.tf_idf import TFIDFScorer
+
+
+class ScoreDocumentsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index, cls.documents = build_index(['doc%d' % i for i in range(1500)])
+        cls.scorer = TFIDFScorer(cls.index)
+        cls.vocab = sorted({token for tokens in cls.documents.values() for token in tokens})
+        
+    def brute_force(self, query_terms, k):
+        """Score every document containing a query term and sort them"""
+        candidates = {doc_id for doc_id, tokens in self.documents.items()
+                      if not set(query_terms).isdisjoint(tokens)}
+        scored = [(doc_id, self.scorer.score_document(query_terms, doc_id)) for doc_id in candidates]
+        scored = [(doc_id, score) for doc_id, score in scored if score > 0]
+        scored.sort(key=lambda entry: (-entry[1], self.index.doc_numbers[entry[0]]))
+        return scored[:k]
+        
+    def assert_same_top_k(self, query_terms, k):
+        got = self.scorer.score_documents(query_terms, k)
+        expected = self.brute_force(query_terms, k)
+        
+        self.assertEqual(len(got), len(expected))
+        for (_, got_score), (_, expected_score) in zip(got, expected):
+            self.assertTrue(math.isclose(got_score, expected_score, rel_tol=1e-9))
+            
+        # Ties at the cut-off may be broken either way; everything above it must match
+        if expected:
+            cutoff = expected[-1][1] + 1e-9
+            self.assertEqual({doc_id for doc_id, score in got if score > cutoff},
+                             {doc_id for doc_id, score in expected if score > cutoff})
+            
+    def test_matches_brute_force(self):
+        rng = random.Random(1)
+        for _ in range(150):
+            query_terms = [rng.choice(self.vocab) for _ in range(rng.randint(1, 5))]
+            k = rng.choice([1, 5, 20, 2000])
+            with self.subTest(query_terms=query_terms, k=k):
+                self.assert_same_top_k(query_terms, k)
+                
+    def test_unknown_terms(self):
+        self.assertEqual(self.scorer.score_documents(['no-such-term']), [])
+        self.assert_same_top_k(['no-such-term', self.vocab[0]], 10)
+        
+    def test_empty_query(self):
+        self.assertEqual(self.scorer.score_documents([]), [])
+        self.assertEqual(self.scorer.score_documents([self.vocab[0]], k=0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
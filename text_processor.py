@@ -1,41 +1,92 @@
 import re
 import string
-from collections import defaultdict
+from collections import Counter, defaultdict
+from functools import lru_cache
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
-from nltk.tokenize import word_tokenize
 import logging
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+logger = logging.getLogger(__name__)
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+# Custom stop words added to NLTK's list
+_CUSTOM_STOP_WORDS = frozenset(['would', 'could', 'should', 'might', 'must'])
 
-logger = logging.getLogger(__name__)
+# language -> frozenset of stop words, shared by all instances
+_STOP_WORDS_CACHE = {}
+
+def _load_stop_words(language):
+    """Get the stop words for a language, loading NLTK's list once"""
+    if language not in _STOP_WORDS_CACHE:
+        # Download required NLTK data on first use rather than at import
+        try:
+            nltk.data.find('corpora/stopwords')
+        except LookupError:
+            nltk.download('stopwords')
+        _STOP_WORDS_CACHE[language] = frozenset(stopwords.words(language)) | _CUSTOM_STOP_WORDS
+    return _STOP_WORDS_CACHE[language]
+
+# Apostrophes and hyphens are deleted, joining "e-mail" and "don't" into
+# "email" and "dont"; all other punctuation separates words like whitespace
+_JOINING_PUNCTUATION = "'-"
+_SEPARATING_PUNCTUATION = ''.join(c for c in string.punctuation if c not in _JOINING_PUNCTUATION)
+_PUNCTUATION_TABLE = str.maketrans(_SEPARATING_PUNCTUATION, ' ' * len(_SEPARATING_PUNCTUATION),
+                                   _JOINING_PUNCTUATION)
+
+# URLs and email addresses, removed in one pass
+_STRIP_RE = re.compile(r'https?://\S+|\b[\w.%+-]+@[\w.-]+\.[A-Za-z]{2,}\b')
+
+# Elements extract_features reads, found in a single traversal
+_HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+_NON_CONTENT_TAGS = frozenset(['script', 'style', 'nav', 'footer'])
+_FEATURE_TAGS = ['title', 'a', 'meta', *_HEADING_TAGS, *_NON_CONTENT_TAGS]
+
+# Weight of terms found in each HTML element
+_FEATURE_WEIGHTS = {
+    'title': 3.0,
+    'headings': 2.0,
+    'body': 1.0,
+    'links': 0.8,
+    'meta': 1.5
+}
+
+# Only queries and short phrases recur; document bodies are nearly always
+# unique, so caching them would just hold whole pages in memory
+_MAX_CACHED_TEXT_LENGTH = 200
+_TEXT_CACHE_SIZE = 10000
 
 class TextProcessor:
+    # PorterStemmer keeps no per-call state, so one instance serves all,
+    # and token frequencies are Zipfian, so its stems are shared too
+    stemmer = PorterStemmer()
+    _stem = staticmethod(lru_cache(maxsize=100_000)(stemmer.stem))
+    
     def __init__(self, language='english'):
         self.language = language
-        self.stemmer = PorterStemmer()
-        self.stop_words = set(stopwords.words(language))
-        
-        # Add custom stop words
-        self.stop_words.update(['would', 'could', 'should', 'might', 'must'])
+        self.stop_words = _load_stop_words(language)
         
         # Compile regex patterns
-        self.url_pattern = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
-        self.email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
         self.number_pattern = re.compile(r'\b\d+\b')
         
+        # Processed short texts, per instance since stop words are
+        self._text_cache = {}  # text -> tuple of processed tokens
+        
     def process_text(self, text):
         """Main text processing pipeline"""
+        if len(text) > _MAX_CACHED_TEXT_LENGTH:
+            return list(self._process_text(text))
+            
+        processed_tokens = self._text_cache.get(text)
+        if processed_tokens is None:
+            if len(self._text_cache) >= _TEXT_CACHE_SIZE:
+                self._text_cache.clear()
+            processed_tokens = self._text_cache[text] = self._process_text(text)
+            
+        # Cached results are tuples; hand out a fresh list each time
+        return list(processed_tokens)
+        
+    def _process_text(self, text):
+        """Uncached process_text, returning an immutable result"""
         # Clean and normalize text
         cleaned_text = self.clean_text(text)
         
@@ -49,57 +100,31 @@ class TextProcessor:
             if processed_token:
                 processed_tokens.append(processed_token)
                 
-        return processed_tokens
+        return tuple(processed_tokens)
         
     def clean_text(self, text):
         """Clean and normalize text"""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove URLs
-        text = self.url_pattern.sub(' ', text)
-        
-        # Remove email addresses
-        text = self.email_pattern.sub(' ', text)
-        
         # Remove numbers (optional)
         # text = self.number_pattern.sub(' ', text)
         
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
+        # Lowercase and remove URLs and email addresses; whitespace runs
+        # are left alone since the tokenizer skips them anyway
+        return _STRIP_RE.sub(' ', text.lower())
         
     def tokenize(self, text):
         """Tokenize text into words"""
-        try:
-            tokens = word_tokenize(text, language=self.language)
-        except:
-            # Fallback to simple split if NLTK fails
-            tokens = text.split()
-            
-        return tokens
+        # One C pass over the whole text instead of stripping each token
+        return text.translate(_PUNCTUATION_TABLE).split()
         
     def process_token(self, token):
         """Process individual token"""
-        # Remove punctuation
-        token = token.translate(str.maketrans('', '', string.punctuation))
-        
-        # Skip if empty or too short
-        if not token or len(token) < 2:
-            return None
-            
-        # Skip if all digits
-        if token.isdigit():
-            return None
-            
-        # Skip stop words
-        if token in self.stop_words:
+        # Skip if too short, all digits or a stop word
+        if len(token) < 2 or token.isdigit() or token in self.stop_words:
             return None
             
         # Stem the token
         try:
-            stemmed_token = self.stemmer.stem(token)
+            stemmed_token = self._stem(token)
             return stemmed_token
         except:
             return token
@@ -108,16 +133,10 @@ class TextProcessor:
         """Extract structured features from HTML content"""
         from bs4 import BeautifulSoup
         
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = BeautifulSoup(html_content, 'lxml')
         
         # Extract different text components with weights
-        features = {
-            'title': self.extract_title_text(soup),
-            'headings': self.extract_heading_text(soup),
-            'body': self.extract_body_text(soup),
-            'links': self.extract_link_text(soup),
-            'meta': self.extract_meta_text(soup)
-        }
+        features = self.extract_feature_texts(soup)
         
         # Process each feature
         processed_features = {}
@@ -129,6 +148,59 @@ class TextProcessor:
                 
         return processed_features
         
+    def extract_feature_texts(self, soup):
+        """Extract the text of every feature in one traversal of the soup
+        
+        Gives the same texts as the individual extract_*_text methods.
+        Non-content elements are decomposed in place.
+        """
+        title = None
+        headings = []
+        links = []
+        meta_tags = []  # description and keywords meta tags, in document order
+        non_content = []
+        
+        for element in soup.find_all(_FEATURE_TAGS):
+            name = element.name
+            if name in _HEADING_TAGS:
+                # Headings are read before non-content elements are removed
+                headings.append(element.get_text())
+            elif name == 'a':
+                links.append(element)
+            elif name == 'meta':
+                if element.get('name') in ('description', 'keywords'):
+                    meta_tags.append(element)
+            elif name == 'title':
+                if title is None:
+                    title = element.get_text()
+            else:
+                non_content.append(element)
+                
+        # Remove script and style elements; nested ones go with their parent
+        for element in non_content:
+            if not element.decomposed:
+                element.decompose()
+                
+        # The first meta tag of each name that survived the removal
+        first_meta_tags = {}
+        for meta_tag in meta_tags:
+            if not meta_tag.decomposed:
+                first_meta_tags.setdefault(meta_tag['name'], meta_tag)
+                
+        meta_texts = []
+        for meta_name in ('description', 'keywords'):
+            meta_tag = first_meta_tags.get(meta_name)
+            if meta_tag is not None and meta_tag.get('content'):
+                meta_texts.append(meta_tag['content'])
+                
+        return {
+            'title': title or '',
+            'headings': ' '.join(headings),
+            'body': soup.get_text(),
+            'links': ' '.join([link.get_text() for link in links if not link.decomposed]),
+            'meta': ' '.join(meta_texts)
+        }
+        
     def extract_title_text(self, soup):
         """Extract title text"""
         title_tag = soup.find('title')
@@ -172,18 +244,10 @@ class TextProcessor:
         """Calculate weighted terms based on HTML structure"""
         term_weights = defaultdict(float)
         
-        # Weight different HTML elements
-        weights = {
-            'title': 3.0,
-            'headings': 2.0,
-            'body': 1.0,
-            'links': 0.8,
-            'meta': 1.5
-        }
-        
+        # Count each feature's terms in C, then weight each distinct term once
         for feature_name, terms in processed_features.items():
-            weight = weights.get(feature_name, 1.0)
-            for term in terms:
-                term_weights[term] += weight
+            weight = _FEATURE_WEIGHTS.get(feature_name, 1.0)
+            for term, count in Counter(terms).items():
+                term_weights[term] += weight * count
                 
         return dict(term_weights)